@@ -0,0 +1,94 @@
+"""Content-addressed on-disk store for uploaded attachments.
+
+Uploaded files are written once to ``attachment_store/`` under their SHA-256
+digest, so the same deck uploaded by several sessions is stored once and
+sessions only keep a small ``StoredAttachment`` handle. A campaign encodes
+each file once, base64-encoding straight from a memory map into a MIME part
+that every message of the campaign shares, and drops the part when it ends.
+Files nobody has touched for a while are evicted; sessions touch their
+handles on every rerun and store the file again if it was evicted anyway.
+"""
+import base64
+import hashlib
+import mmap
+import os
+import tempfile
+import time
+from email.mime.base import MIMEBase
+
+STORE_DIR = 'attachment_store'
+
+# Files unused for this long are removed from the store
+DEFAULT_MAX_AGE = 24 * 60 * 60
+
+
+class StoredAttachment:
+    """Handle to an attachment in the store; cheap to keep in session state."""
+
+    def __init__(self, name, type, size, digest, path):
+        self.name = name
+        self.type = type
+        self.size = size
+        self.digest = digest
+        self.path = path
+
+    def touch(self):
+        """Mark the file as in use; return False if it has been evicted."""
+        try:
+            os.utime(self.path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def mime_part(self):
+        """Encode the attachment into a MIME part that messages can share."""
+        part = MIMEBase('application', 'octet-stream')
+        with open(self.path, 'rb') as f:
+            os.utime(self.path)
+            if os.fstat(f.fileno()).st_size:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    part.set_payload(base64.encodebytes(data).decode('ascii'))
+            else:
+                part.set_payload('')
+        part['Content-Transfer-Encoding'] = 'base64'
+        part.add_header('Content-Disposition', 'attachment', filename=self.name)
+        return part
+
+
+class AttachmentStore:
+    """Directory of attachments named by the SHA-256 of their content."""
+
+    def __init__(self, root=STORE_DIR, max_age=DEFAULT_MAX_AGE):
+        self.root = root
+        self.max_age = max_age
+        os.makedirs(root, exist_ok=True)
+
+    def put(self, uploaded_file):
+        """Store an uploaded file and return its ``StoredAttachment``."""
+        # getbuffer() exposes the upload without another copy
+        data = uploaded_file.getbuffer()
+        digest = hashlib.sha256(data).hexdigest()
+        path = os.path.join(self.root, digest)
+
+        if os.path.exists(path):
+            os.utime(path)
+        else:
+            # Write under a temporary name so readers never see a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=self.root)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+        self.evict()
+        return StoredAttachment(uploaded_file.name, uploaded_file.type, len(data), digest, path)
+
+    def evict(self):
+        """Remove files that have not been used within ``max_age`` seconds."""
+        cutoff = time.time() - self.max_age
+        for entry in os.scandir(self.root):
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                # Another session evicted it first
+                pass
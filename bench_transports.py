@@ -0,0 +1,95 @@
+"""Compare send throughput of the available transports.
+
+Runs every SMTP variant against a local aiosmtpd sink, so nothing leaves the
+machine:
+
+    pip install aiosmtpd
+    python bench_transports.py --messages 500
+
+Pass ``--gmail you@example.com`` to also time the Gmail API transport. This
+sends real emails to that address using the stored ``token.json``.
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.mime.text import MIMEText
+from transports import SmtpTransport
+
+HOST = '127.0.0.1'
+PORT = 8025
+
+
+class SinkHandler:
+    """aiosmtpd handler that accepts and discards every message."""
+
+    def __init__(self):
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return '250 OK'
+
+
+def build_messages(count, to, size):
+    messages = []
+    for i in range(count):
+        message = MIMEText(f"Message {i}\n" + 'x' * size)
+        message['to'] = to
+        message['from'] = 'bench@localhost'
+        message['subject'] = f"Transport benchmark {i}"
+        messages.append(message)
+    return messages
+
+
+def run(transport, messages, threads):
+    """Send ``messages`` through ``transport`` and return messages per second."""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        outcomes = list(pool.map(transport.send, messages))
+    elapsed = time.perf_counter() - start
+    transport.close()
+    failed = sum(1 for success, _ in outcomes if not success)
+    if failed:
+        print(f"  {failed} message(s) failed, e.g. {next(r for s, r in outcomes if not s)}")
+    return len(messages) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=500)
+    parser.add_argument('--size', type=int, default=2000, help="body size in bytes")
+    parser.add_argument('--gmail', metavar='ADDRESS', help="also benchmark the Gmail API by sending to ADDRESS")
+    args = parser.parse_args()
+
+    from aiosmtpd.controller import Controller
+
+    handler = SinkHandler()
+    controller = Controller(handler, hostname=HOST, port=PORT)
+    controller.start()
+    try:
+        messages = build_messages(args.messages, 'sink@localhost', args.size)
+        variants = [
+            ("SMTP, 1 connection", dict(pool_size=1, pipelining=False), 1),
+            ("SMTP, 1 connection, pipelined", dict(pool_size=1, pipelining=True), 1),
+            ("SMTP, 4 connections, pipelined", dict(pool_size=4, pipelining=True), 4),
+            # A fresh session per message, as a non-pooled sender would do
+            ("SMTP, new connection per message", dict(pool_size=1, messages_per_connection=1), 1),
+        ]
+        for label, options, threads in variants:
+            transport = SmtpTransport(HOST, PORT, starttls=False, **options)
+            rate = run(transport, messages, threads)
+            print(f"{label:<36} {rate:8.1f} msg/s  ({transport.stats()['connections_opened']} connection(s))")
+    finally:
+        controller.stop()
+
+    if args.gmail:
+        from send_daemon import load_gmail_service
+        from transports import GmailApiTransport
+
+        messages = build_messages(min(args.messages, 20), args.gmail, args.size)
+        rate = run(GmailApiTransport(load_gmail_service()), messages, 1)
+        print(f"{'Gmail API':<36} {rate:8.1f} msg/s")
+
+
+if __name__ == "__main__":
+    main()
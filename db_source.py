@@ -0,0 +1,171 @@
+"""Stream recipients straight from a SQL database.
+
+``SqlRecipientSource`` wraps a SELECT query on a SQLite, PostgreSQL or MySQL
+DB-API connection and reads it in keyset-paginated batches
+(``WHERE key > last ORDER BY key LIMIT n``), fetching only the columns the
+email template uses. Memory use stays the same however large the table is,
+and rows come out as the same lower-cased dicts the send loop gets from an
+uploaded file. Other drivers work if their database accepts ``LIMIT`` and
+the identifier quoting is passed in.
+"""
+import importlib
+import pathlib
+import re
+import sqlite3
+
+DEFAULT_BATCH_SIZE = 1000
+
+PLACEHOLDER_PATTERN = re.compile(r'\{\{(.*?)\}\}')
+
+
+def template_fields(*texts):
+    """Return the lower-cased placeholder names used in the template texts."""
+    return {field.strip().lower() for text in texts for field in PLACEHOLDER_PATTERN.findall(text)}
+
+
+# Drivers for databases that quote identifiers with backticks
+BACKTICK_DRIVERS = {'pymysql', 'MySQLdb', 'mysql'}
+
+
+def connect_sqlite_readonly(path):
+    """Open a SQLite database read-only; a mistyped path fails instead of creating a file."""
+    return sqlite3.connect(pathlib.Path(path).resolve().as_uri() + '?mode=ro', uri=True)
+
+
+def _driver_name(conn):
+    return type(conn).__module__.split('.')[0]
+
+
+def _driver_paramstyle(conn):
+    """Look up the DB-API paramstyle of the driver that made ``conn``."""
+    try:
+        return importlib.import_module(_driver_name(conn)).paramstyle
+    except (ImportError, AttributeError):
+        return 'qmark'
+
+
+def _driver_identifier_quote(conn):
+    """Return the character the driver's database quotes identifiers with."""
+    return '`' if _driver_name(conn) in BACKTICK_DRIVERS else '"'
+
+
+def _params(paramstyle, values):
+    """Return SQL markers and the matching parameters for ``values``."""
+    if paramstyle == 'qmark':
+        return ['?'] * len(values), list(values)
+    if paramstyle in ('format', 'pyformat'):
+        return ['%s'] * len(values), list(values)
+    if paramstyle == 'numeric':
+        return [f':{n}' for n in range(1, len(values) + 1)], list(values)
+    if paramstyle == 'named':
+        names = [f'p{n}' for n in range(len(values))]
+        return [f':{name}' for name in names], dict(zip(names, values))
+    raise ValueError(f"Unsupported paramstyle: {paramstyle}")
+
+
+def _quote(name, quote='"'):
+    """Quote an identifier for use in SQL that goes through str.format."""
+    quoted = quote + name.replace(quote, quote * 2) + quote
+    return quoted.replace('{', '{{').replace('}', '}}')
+
+
+class SqlRecipientSource:
+    """Recipients produced by a SQL query.
+
+    ``connect`` is a zero-argument callable returning a new DB-API connection;
+    a fresh connection is opened for every read because Streamlit may rerun
+    the script on a different thread. ``key`` must be a unique, orderable
+    column of the query's result. ``paramstyle`` and ``identifier_quote``
+    default to what the connection's driver uses.
+    """
+
+    def __init__(self, connect, query, key='id', batch_size=DEFAULT_BATCH_SIZE, paramstyle=None,
+                 identifier_quote=None):
+        self.connect = connect
+        # Braces are escaped because the SQL is later passed through str.format
+        self.query = query.strip().rstrip(';').replace('{', '{{').replace('}', '}}')
+        self.key = key
+        self.batch_size = batch_size
+        self.paramstyle = paramstyle
+        self.identifier_quote = identifier_quote
+
+    def _execute(self, conn, sql, values=()):
+        paramstyle = self.paramstyle or _driver_paramstyle(conn)
+        markers, params = _params(paramstyle, values)
+        if paramstyle in ('format', 'pyformat'):
+            # These drivers read every % as a marker, including ones in LIKE '%...' patterns
+            sql = sql.replace('%', '%%')
+        cursor = conn.cursor()
+        cursor.execute(sql.format(*markers), params)
+        return cursor
+
+    def _column_map(self, conn):
+        """Map lower-cased column names to their names in the query result."""
+        cursor = self._execute(conn, f"SELECT * FROM ({self.query}) AS src WHERE 1 = 0")
+        columns = {d[0].lower(): d[0] for d in cursor.description}
+        cursor.close()
+        if 'email' not in columns:
+            raise ValueError("The query must return an 'Email' column.")
+        if self.key.lower() not in columns:
+            raise ValueError(f"The query must return the key column '{self.key}'.")
+        return columns
+
+    def columns(self):
+        """Return the lower-cased columns available for personalization."""
+        conn = self.connect()
+        try:
+            return list(self._column_map(conn))
+        finally:
+            conn.close()
+
+    def count(self):
+        """Return the number of rows the query produces."""
+        conn = self.connect()
+        try:
+            cursor = self._execute(conn, f"SELECT COUNT(*) FROM ({self.query}) AS src")
+            return cursor.fetchone()[0]
+        finally:
+            conn.close()
+
+    def rows(self, fields=None, limit=None):
+        """Yield recipient rows as dicts, one batch in memory at a time.
+
+        ``fields`` limits the columns fetched (``email`` and the key are always
+        included); ``None`` fetches every column.
+        """
+        conn = self.connect()
+        try:
+            available = self._column_map(conn)
+            wanted = set(available) if fields is None else {f for f in fields if f in available}
+            wanted |= {'email', self.key.lower()}
+            names = [available[name] for name in sorted(wanted)]
+            keys = [name.lower() for name in names]
+            key_index = keys.index(self.key.lower())
+
+            quote = self.identifier_quote or _driver_identifier_quote(conn)
+            select = ", ".join(_quote(name, quote) for name in names)
+            key = _quote(available[self.key.lower()], quote)
+            first_page = f"SELECT {select} FROM ({self.query}) AS src ORDER BY {key} LIMIT {{0}}"
+            next_page = f"SELECT {select} FROM ({self.query}) AS src WHERE {key} > {{0}} ORDER BY {key} LIMIT {{1}}"
+
+            last = None
+            produced = 0
+            while limit is None or produced < limit:
+                size = self.batch_size if limit is None else min(self.batch_size, limit - produced)
+                if last is None:
+                    cursor = self._execute(conn, first_page, (size,))
+                else:
+                    cursor = self._execute(conn, next_page, (last, size))
+                batch = cursor.fetchall()
+                cursor.close()
+                if not batch:
+                    return
+
+                for values in batch:
+                    yield dict(zip(keys, values))
+                produced += len(batch)
+                last = batch[-1][key_index]
+                if len(batch) < size:
+                    return
+        finally:
+            conn.close()
@@ -0,0 +1,154 @@
+"""Recipient-domain-aware send ordering.
+
+Lists sorted by company put thousands of messages for the same domain next
+to each other, and receiving servers answer a burst like that with deferrals.
+``DomainScheduler`` reorders recipients round-robin across domains as they
+stream in, with an optional per-domain rate cap. Memory stays
+bounded on any list size: rows of a domain that has more than its share
+waiting are spooled to a temporary file until their turn comes.
+"""
+import collections
+import pickle
+import tempfile
+import time
+
+# Rows held in memory across all domains before reading ahead stops
+DEFAULT_WINDOW = 10000
+
+# Rows held in memory per domain before the rest is spooled to disk
+DEFAULT_DOMAIN_BUFFER = 100
+
+
+def recipient_domain(email):
+    """Return the lower-cased domain of an address, or '' if there is none."""
+    if isinstance(email, str) and '@' in email:
+        return email.rsplit('@', 1)[1].strip().lower()
+    return ''
+
+
+class _DomainQueue:
+    """Rows waiting for one domain: a small deque backed by a spool file."""
+
+    def __init__(self, buffer_size):
+        self.buffer_size = buffer_size
+        self.rows = collections.deque()
+        self.spool = None
+        self.spooled = 0
+        self.read_pos = 0
+
+    def __len__(self):
+        return len(self.rows) + self.spooled
+
+    def push(self, row):
+        """Queue a row; returns False if it had to be spooled to disk."""
+        if not self.spooled and len(self.rows) < self.buffer_size:
+            self.rows.append(row)
+            return True
+        if self.spool is None:
+            self.spool = tempfile.TemporaryFile()
+        self.spool.seek(0, 2)
+        pickle.dump(row, self.spool)
+        self.spooled += 1
+        return False
+
+    def pop(self):
+        """Take the oldest row, refilling the buffer from disk when needed."""
+        if not self.rows and self.spooled:
+            self.spool.seek(self.read_pos)
+            while self.spooled and len(self.rows) < self.buffer_size:
+                self.rows.append(pickle.load(self.spool))
+                self.spooled -= 1
+            self.read_pos = self.spool.tell()
+        return self.rows.popleft()
+
+    def close(self):
+        if self.spool is not None:
+            self.spool.close()
+
+
+class DomainScheduler:
+    """Yield rows interleaved round-robin by recipient domain.
+
+    ``domain_interval`` is the minimum number of seconds between two rows of
+    the same domain; iteration sleeps when every waiting domain is inside it.
+    """
+
+    def __init__(self, rows, key='email', window=DEFAULT_WINDOW, domain_buffer=DEFAULT_DOMAIN_BUFFER,
+                 domain_interval=0):
+        self.rows = iter(rows)
+        self.key = key
+        self.window = window
+        self.domain_buffer = domain_buffer
+        self.domain_interval = domain_interval
+        self.queues = {}
+        self.ring = collections.deque()
+        # Earliest next send for rate-limited domains, kept after their queue is gone
+        self.next_send = {}
+        self.in_memory = 0
+        self.exhausted = False
+
+    def _fill(self):
+        """Read ahead until the in-memory window is full or the input ends."""
+        while not self.exhausted and self.in_memory < self.window:
+            try:
+                row = next(self.rows)
+            except StopIteration:
+                self.exhausted = True
+                break
+            domain = recipient_domain(row.get(self.key))
+            queue = self.queues.get(domain)
+            if queue is None:
+                queue = self.queues[domain] = _DomainQueue(self.domain_buffer)
+                self.ring.append(domain)
+            if queue.push(row):
+                self.in_memory += 1
+
+    def _take(self, now):
+        """Pop a row from the next domain allowed to send, or return a wait."""
+        wait = None
+        for _ in range(len(self.ring)):
+            domain = self.ring[0]
+            self.ring.rotate(-1)
+            queue = self.queues[domain]
+            if not len(queue):
+                continue
+            next_send = self.next_send.get(domain, 0)
+            if next_send > now:
+                remaining = next_send - now
+                wait = remaining if wait is None else min(wait, remaining)
+                continue
+
+            buffered = len(queue.rows)
+            row = queue.pop()
+            self.in_memory += len(queue.rows) - buffered
+            if self.domain_interval:
+                self.next_send[domain] = now + self.domain_interval
+            self._release_domain(domain)
+            return row, None
+        return None, wait
+
+    def _release_domain(self, domain):
+        """Forget a domain once nothing of it is queued."""
+        queue = self.queues[domain]
+        if len(queue):
+            return
+        queue.close()
+        del self.queues[domain]
+        self.ring.remove(domain)
+
+        # Drop rate limits that have already expired
+        if len(self.next_send) > self.window:
+            now = time.monotonic()
+            self.next_send = {d: t for d, t in self.next_send.items() if t > now}
+
+    def __iter__(self):
+        while True:
+            self._fill()
+            if not self.ring:
+                return
+            row, wait = self._take(time.monotonic())
+            if row is None:
+                # Every waiting domain is rate limited
+                time.sleep(wait)
+                continue
+            yield row
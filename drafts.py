@@ -0,0 +1,190 @@
+"""Two-phase sending through Gmail drafts for timed releases.
+
+Staging renders every message ahead of time and uploads it with
+``users.drafts.create``. At release time only ``users.drafts.send`` calls are
+left, issued from a thread pool, so the whole campaign goes out within
+minutes of the chosen time instead of over hours. Staged draft IDs are saved
+to ``staged_drafts/`` so a release can be scheduled from any later session.
+``ScheduledRelease`` waits in a background thread; shortly before the release
+it refreshes the credentials and opens the connection pool, so the first
+sends do not pay for either. The release records when each send completed so
+the spread can be reported.
+"""
+import base64
+import json
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from google.auth.transport.requests import Request
+from transports import Transport
+
+STAGED_DIR = 'staged_drafts'
+
+# Parallel drafts.send calls during a release
+DEFAULT_RELEASE_CONCURRENCY = 16
+
+# Seconds before the release at which credentials and connections are warmed up
+RELEASE_WARMUP_SECONDS = 30
+
+# Retries for rate limited (429) or failed (5xx) calls, with exponential backoff
+NUM_RETRIES = 5
+
+
+class DraftStager(Transport):
+    """Transport that stores each message as a draft instead of sending it."""
+
+    name = 'Gmail drafts'
+
+    def __init__(self, service, user_id='me'):
+        self.service = service
+        self.user_id = user_id
+        self.staged = []
+
+    def send(self, message):
+        raw = base64.urlsafe_b64encode(message.as_bytes()).decode('utf-8')
+        try:
+            draft = self.service.users().drafts().create(
+                userId=self.user_id, body={'message': {'raw': raw}}).execute(num_retries=NUM_RETRIES)
+        except Exception as e:
+            return False, str(e)
+        self.staged.append({'recipient': message['to'], 'draft_id': draft['id']})
+        return True, draft['id']
+
+    def save(self, directory=STAGED_DIR):
+        """Write the staged draft IDs to a JSON file and return its path."""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, time.strftime('%Y%m%d-%H%M%S') + '.json')
+        with open(path, 'w') as f:
+            json.dump(self.staged, f)
+        return path
+
+
+def list_staged(directory=STAGED_DIR):
+    """Return the saved staged-draft files, newest first."""
+    if not os.path.isdir(directory):
+        return []
+    names = sorted((name for name in os.listdir(directory) if name.endswith('.json')), reverse=True)
+    return [os.path.join(directory, name) for name in names]
+
+
+def load_staged(path):
+    """Read back the ``{'recipient', 'draft_id'}`` entries written by ``DraftStager.save``."""
+    with open(path) as f:
+        return json.load(f)
+
+
+def warm_up(service, concurrency=DEFAULT_RELEASE_CONCURRENCY, user_id='me'):
+    """Refresh the access token and open ``concurrency`` connections ahead of a release.
+
+    Returns the mailbox history ID, which marks where bounce tracking starts.
+    """
+    # A fresh token cannot expire during the release and force a refresh mid-way
+    credentials = getattr(getattr(service, '_http', None), 'credentials', None)
+    if credentials is not None and getattr(credentials, 'refresh_token', None):
+        credentials.refresh(Request())
+
+    def profile(_):
+        return service.users().getProfile(userId=user_id).execute(num_retries=NUM_RETRIES)
+
+    # Parallel calls make the pool open one connection per release thread
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        profiles = list(pool.map(profile, range(concurrency)))
+    return profiles[0]['historyId']
+
+
+def release_drafts(service, draft_ids, concurrency=DEFAULT_RELEASE_CONCURRENCY, user_id='me'):
+    """Send staged drafts in parallel and time each send.
+
+    Returns one dict per draft, in input order, with ``success``,
+    ``message_id`` or ``error``, the call ``latency`` and ``completed``, the
+    seconds from the start of the release until that send finished.
+    """
+    start = time.perf_counter()
+
+    def send(draft_id):
+        call_start = time.perf_counter()
+        try:
+            sent = service.users().drafts().send(
+                userId=user_id, body={'id': draft_id}).execute(num_retries=NUM_RETRIES)
+            outcome = {'success': True, 'message_id': sent['id'], 'error': None}
+        except Exception as e:
+            outcome = {'success': False, 'message_id': None, 'error': str(e)}
+        end = time.perf_counter()
+        outcome.update(draft_id=draft_id, latency=end - call_start, completed=end - start)
+        return outcome
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(send, draft_ids))
+
+
+def release_report(outcomes):
+    """Summarize how a release was spread over time."""
+    completed = sorted(o['completed'] for o in outcomes if o['success'])
+    latencies = [o['latency'] for o in outcomes]
+
+    def percentile(p):
+        return round(completed[min(len(completed) - 1, int(len(completed) * p))], 3) if completed else None
+
+    return {
+        'drafts': len(outcomes),
+        'sent': len(completed),
+        'failed': len(outcomes) - len(completed),
+        'first_sent': percentile(0),
+        'p50_sent': percentile(0.5),
+        'p90_sent': percentile(0.9),
+        'p99_sent': percentile(0.99),
+        'last_sent': round(completed[-1], 3) if completed else None,
+        'mean_call_latency': round(statistics.mean(latencies), 3) if latencies else None,
+    }
+
+
+class ScheduledRelease(threading.Thread):
+    """Release staged drafts at ``release_at`` (a ``time.time()`` timestamp).
+
+    Runs in its own thread so nothing waits on it, and keeps going if the
+    session that scheduled it goes away. ``state`` moves from ``'scheduled'``
+    through ``'warming up'`` and ``'sending'`` to ``'done'``, ``'failed'`` or
+    ``'cancelled'``.
+    """
+
+    def __init__(self, service, staged, release_at, concurrency=DEFAULT_RELEASE_CONCURRENCY,
+                 warmup=RELEASE_WARMUP_SECONDS):
+        super().__init__(daemon=True)
+        self.service = service
+        self.staged = staged
+        self.release_at = release_at
+        self.concurrency = concurrency
+        self.warmup = warmup
+        self.state = 'scheduled'
+        self.history_id = None
+        self.outcomes = None
+        self.error = None
+        self.cancelled = threading.Event()
+
+    def run(self):
+        try:
+            if self._wait_until(self.release_at - self.warmup):
+                return
+            self.state = 'warming up'
+            self.history_id = warm_up(self.service, self.concurrency)
+            if self._wait_until(self.release_at):
+                return
+            self.state = 'sending'
+            self.outcomes = release_drafts(self.service, [d['draft_id'] for d in self.staged], self.concurrency)
+            self.state = 'done'
+        except Exception as e:
+            self.error = str(e)
+            self.state = 'failed'
+
+    def _wait_until(self, timestamp):
+        """Wait until ``timestamp``; return True if the release was cancelled meanwhile."""
+        if self.cancelled.wait(max(0, timestamp - time.time())):
+            self.state = 'cancelled'
+            return True
+        return False
+
+    def cancel(self):
+        """Stop a release that has not started sending yet."""
+        self.cancelled.set()
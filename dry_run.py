@@ -0,0 +1,134 @@
+"""Dry-run backend that renders a campaign to disk instead of sending it.
+
+Messages go through the same render pipeline as a real send and are written
+to an mbox file, a directory of ``.eml`` files or a zip archive. Nothing
+touches the Gmail API, so a large campaign can be checked in seconds, and the
+closing report lists message sizes and any placeholders left unresolved.
+"""
+import os
+import re
+import time
+import zipfile
+import collections
+
+# Output formats understood by DryRunWriter
+DRY_RUN_FORMATS = ['mbox', 'eml', 'zip']
+
+# Bytes collected in memory before a bulk write to disk
+DEFAULT_BUFFER_SIZE = 8 * 1024 * 1024
+
+PLACEHOLDER_PATTERN = re.compile(r'\{\{(.*?)\}\}')
+
+# Names of the files the eml format writes
+EML_NAME_PATTERN = re.compile(r'^\d{7}\.eml$')
+
+# Lines that mboxrd quoting has to escape
+MBOX_FROM_PATTERN = re.compile(rb'^(>*From )', re.MULTILINE)
+
+
+def find_unresolved(*texts):
+    """Return the placeholder names still present in rendered text."""
+    return [match.strip().lower() for text in texts for match in PLACEHOLDER_PATTERN.findall(text)]
+
+
+class DryRunWriter:
+    """Collect rendered messages and write them to disk in large batches."""
+
+    def __init__(self, path, fmt='mbox', buffer_size=DEFAULT_BUFFER_SIZE):
+        if fmt not in DRY_RUN_FORMATS:
+            raise ValueError(f"Unsupported dry run format: {fmt}")
+        self.path = path
+        self.fmt = fmt
+        self.buffer_size = buffer_size
+        self.buffer = []
+        self.buffered = 0
+        self.sizes = []
+        self.unresolved = collections.Counter()
+        self.rows_with_unresolved = 0
+        self.started = time.perf_counter()
+
+        if fmt == 'eml':
+            os.makedirs(path, exist_ok=True)
+            self._clear_eml_dir()
+            self.out = None
+        else:
+            parent = os.path.dirname(path)
+            if parent:
+                os.makedirs(parent, exist_ok=True)
+            if fmt == 'zip':
+                self.out = zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED)
+            else:
+                self.out = open(path, 'wb')
+
+    def _clear_eml_dir(self):
+        """Remove an earlier dry run's files so runs do not mix; refuse other content."""
+        names = os.listdir(self.path)
+        others = [name for name in names if not EML_NAME_PATTERN.match(name)]
+        if others:
+            raise ValueError(f"Dry run directory {self.path} contains other files; choose an empty directory.")
+        for name in names:
+            os.remove(os.path.join(self.path, name))
+
+    def write(self, message, unresolved=()):
+        """Queue one ``email.message.Message`` for writing."""
+        data = message.as_bytes()
+        self.sizes.append(len(data))
+        if unresolved:
+            self.rows_with_unresolved += 1
+            self.unresolved.update(unresolved)
+
+        self.buffer.append(data)
+        self.buffered += len(data)
+        if self.buffered >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """Write every buffered message to disk."""
+        if not self.buffer:
+            return
+        first = len(self.sizes) - len(self.buffer)
+        if self.fmt == 'mbox':
+            self.out.write(b''.join(
+                b'From MAILER-DAEMON Thu Jan  1 00:00:00 1970\n'
+                + MBOX_FROM_PATTERN.sub(rb'>\1', data.replace(b'\r\n', b'\n'))
+                + b'\n\n'
+                for data in self.buffer))
+        else:
+            for n, data in enumerate(self.buffer, start=first + 1):
+                name = f'{n:07d}.eml'
+                if self.fmt == 'zip':
+                    self.out.writestr(name, data)
+                else:
+                    with open(os.path.join(self.path, name), 'wb') as f:
+                        f.write(data)
+        self.buffer = []
+        self.buffered = 0
+
+    def close(self):
+        """Flush remaining messages and return the summary report.
+
+        Safe to call again, e.g. from cleanup after the report was taken.
+        """
+        self.flush()
+        if self.out is not None:
+            self.out.close()
+            self.out = None
+
+        sizes = sorted(self.sizes)
+
+        def percentile(p):
+            return sizes[min(len(sizes) - 1, int(len(sizes) * p))] if sizes else 0
+
+        return {
+            'path': self.path,
+            'format': self.fmt,
+            'messages': len(sizes),
+            'total_bytes': sum(sizes),
+            'size_min': sizes[0] if sizes else 0,
+            'size_median': percentile(0.5),
+            'size_p95': percentile(0.95),
+            'size_max': sizes[-1] if sizes else 0,
+            'rows_with_unresolved': self.rows_with_unresolved,
+            'unresolved_placeholders': dict(self.unresolved.most_common()),
+            'elapsed_seconds': round(time.perf_counter() - self.started, 3),
+        }
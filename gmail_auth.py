@@ -0,0 +1,35 @@
+"""OAuth scopes and stored credentials shared by the app and the send daemon.
+
+Sending and bounce tracking need ``SCOPES``. Staging drafts also needs
+``COMPOSE_SCOPE``, which is only requested when drafts are used, so tokens
+created before drafts existed keep working for everything else. Stored
+credentials are always loaded with the scopes they were granted: asking to
+refresh a token for scopes it never had makes Google reject the refresh.
+"""
+import json
+import os
+from google.oauth2.credentials import Credentials
+
+# Scopes every login asks for
+SCOPES = ['https://www.googleapis.com/auth/gmail.send', 'https://www.googleapis.com/auth/gmail.readonly']
+
+# Extra scope for creating and sending drafts
+COMPOSE_SCOPE = 'https://www.googleapis.com/auth/gmail.compose'
+DRAFT_SCOPES = SCOPES + [COMPOSE_SCOPE]
+
+# Path for storing credentials
+TOKEN_FILE = 'token.json'
+
+
+def load_credentials(token_file=TOKEN_FILE):
+    """Load stored credentials with their granted scopes, or None if there are none."""
+    if not os.path.exists(token_file):
+        return None
+    with open(token_file) as token:
+        return Credentials.from_authorized_user_info(json.loads(token.read()))
+
+
+def save_credentials(creds, token_file=TOKEN_FILE):
+    """Store credentials for the next run."""
+    with open(token_file, 'w') as token:
+        token.write(creds.to_json())
@@ -0,0 +1,42 @@
+"""Pull ``data:`` URI images out of HTML templates into shared CID parts.
+
+Images pasted into the rich editor end up base64-encoded inside the HTML.
+Left there, they are copied through personalization and re-encoded for every
+recipient. Extracting them once per campaign leaves a small template that
+refers to them with ``cid:`` URLs and a set of image parts that every message
+reuses as-is.
+"""
+import base64
+import hashlib
+import re
+from email.mime.image import MIMEImage
+
+# src="data:image/png;base64,...." with either quote style
+DATA_URI_PATTERN = re.compile(
+    r'''(?P<quote>["'])data:image/(?P<subtype>[\w.+-]+);base64,(?P<data>[A-Za-z0-9+/=\s]+)(?P=quote)''',
+    re.IGNORECASE,
+)
+
+
+def extract_inline_images(html):
+    """Replace inline images in ``html`` with ``cid:`` references.
+
+    Returns the rewritten HTML and a tuple of ``MIMEImage`` parts, one per
+    distinct image. Call it once per campaign and share the parts across its
+    messages.
+    """
+    parts = {}
+
+    def replace(match):
+        data = base64.b64decode(re.sub(r'\s', '', match.group('data')))
+        # Identical images share one part
+        cid = hashlib.sha1(data).hexdigest()[:16] + '@autoemail'
+        if cid not in parts:
+            part = MIMEImage(data, _subtype=match.group('subtype').lower())
+            part.add_header('Content-ID', f'<{cid}>')
+            part.add_header('Content-Disposition', 'inline')
+            parts[cid] = part
+        quote = match.group('quote')
+        return f'{quote}cid:{cid}{quote}'
+
+    return DATA_URI_PATTERN.sub(replace, html), tuple(parts.values())
@@ -2,20 +2,28 @@ import streamlit as st
 import pandas as pd
 import base64
 import os
-import json
 import time
-from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from email.mime.application import MIMEApplication
 import re
 import datetime
 import io
 from PIL import Image
 import uuid
+import functools
+from send_daemon import daemon_available, daemon_poll, DaemonJob
+from bounce_tracker import BounceTracker
+from inline_images import extract_inline_images
+from http_transport import build_gmail_service, transport_stats, MAX_POOL_SIZE
+from dry_run import DryRunWriter, DRY_RUN_FORMATS, find_unresolved
+from domain_scheduler import DomainScheduler
+from transports import GmailApiTransport, SmtpTransport
+from db_source import SqlRecipientSource, connect_sqlite_readonly, template_fields
+from attachment_store import AttachmentStore
+from drafts import DraftStager, ScheduledRelease, list_staged, load_staged, release_report, DEFAULT_RELEASE_CONCURRENCY
+from gmail_auth import SCOPES, DRAFT_SCOPES, TOKEN_FILE, load_credentials, save_credentials
 
 # Set page configuration
 st.set_page_config(
@@ -24,12 +32,8 @@ st.set_page_config(
     layout="wide",
 )
 
-# Define the required scopes
-SCOPES = ['https://www.googleapis.com/auth/gmail.send', 'https://www.googleapis.com/auth/gmail.readonly']
-
-# Path for storing credentials
+# Path of the OAuth client secrets
 CREDENTIALS_FILE = 'credentials.json'
-TOKEN_FILE = 'token.json'
 
 # Add custom CSS
 st.markdown("""
@@ -60,65 +64,91 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-def get_gmail_service():
-    """Get authenticated Gmail API service."""
-    creds = None
-    if os.path.exists(TOKEN_FILE):
-        creds = Credentials.from_authorized_user_info(
-            json.loads(open(TOKEN_FILE).read()), SCOPES)
+def get_gmail_service(scopes=SCOPES):
+    """Get authenticated Gmail API service with at least ``scopes`` granted."""
+    creds = load_credentials()
     
-    # If credentials don't exist or are invalid, let the user log in
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
+    # If credentials don't exist, are invalid or lack a scope, let the user log in
+    if not creds or not creds.valid or not creds.has_scopes(scopes):
+        if creds and creds.has_scopes(scopes) and creds.expired and creds.refresh_token:
             creds.refresh(Request())
         else:
             if not os.path.exists(CREDENTIALS_FILE):
                 st.error("Missing credentials.json file. Please create it first.")
                 st.stop()
-                
-            flow = InstalledAppFlow.from_client_secrets_file(CREDENTIALS_FILE, SCOPES)
+            
+            # Keep the scopes already granted when asking for more
+            granted = creds.scopes if creds and creds.scopes else []
+            flow = InstalledAppFlow.from_client_secrets_file(CREDENTIALS_FILE, sorted(set(granted) | set(scopes)))
             creds = flow.run_local_server(port=0)
         
         # Save the credentials for next run
-        with open(TOKEN_FILE, 'w') as token:
-            token.write(creds.to_json())
+        save_credentials(creds)
     
-    # Return Gmail API service
-    return build('gmail', 'v1', credentials=creds)
+    # Return the Gmail API service for this account, reusing its connection pool
+    return cached_gmail_service(creds.client_id, creds.refresh_token, creds)
 
-def create_message(sender, to, subject, message_text, is_html=False, attachments=None):
-    """Create a message for an email with optional attachments."""
+@st.cache_resource(show_spinner=False)
+def cached_gmail_service(client_id, refresh_token, _creds):
+    """Build one Gmail service on a pooled keep-alive transport per account."""
+    # The service refreshes its own credentials, so it can outlive the token it was built from.
+    # Connections open on demand, so the pool is sized for the most parallel release allowed.
+    return build_gmail_service(_creds, pool_size=MAX_POOL_SIZE)
+
+@st.cache_resource(show_spinner=False)
+def scheduled_releases():
+    """Draft releases scheduled by any session, keyed by staged-draft file."""
+    return {}
+
+def build_mime_message(sender, to, subject, message_text, is_html=False, attachments=None, inline_images=None):
+    """Build the MIME message for an email with optional attachments and inline images."""
     message = MIMEMultipart('alternative')
     message['to'] = to
     message['from'] = sender
     message['subject'] = subject
     
-    if is_html:
+    if is_html and inline_images:
+        # Keep the HTML and the images it references by cid: together
+        related = MIMEMultipart('related')
+        related.attach(MIMEText(message_text, 'html'))
+        for image in inline_images:
+            related.attach(image)
+        message.attach(related)
+    elif is_html:
         message.attach(MIMEText(message_text, 'html'))
     else:
         message.attach(MIMEText(message_text, 'plain'))
     
-    # Add attachments if any
+    # Add attachments if any (MIME parts encoded once per campaign and shared)
     if attachments:
         for attachment in attachments:
-            attach_name = attachment.name
-            content_type = attachment.type
-            file_data = attachment.getvalue()
-            
-            part = MIMEApplication(file_data)
-            part.add_header('Content-Disposition', 'attachment', filename=attach_name)
-            message.attach(part)
-        
+            message.attach(attachment)
+    
+    return message
+
+def encode_message(message):
+    """Encode a MIME message as a Gmail API message body."""
     raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode('utf-8')
     return {'raw': raw_message}
 
-def send_message(service, user_id, message):
-    """Send an email message."""
-    try:
-        message = service.users().messages().send(userId=user_id, body=message).execute()
-        return True, message['id']
-    except Exception as e:
-        return False, str(e)
+def create_message(sender, to, subject, message_text, is_html=False, attachments=None, inline_images=None):
+    """Create a message for an email with optional attachments and inline images."""
+    return encode_message(build_mime_message(sender, to, subject, message_text, is_html, attachments, inline_images))
+
+def daemon_result(event):
+    """Turn a send daemon progress event into a results row."""
+    return {
+        "recipient": event["recipient"],
+        "status": "Success" if event["success"] else "Failed",
+        "message_id": event["message_id"],
+        "error": event["error"],
+        "timestamp": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    }
+
+def clear_recipients():
+    """Forget the loaded recipients when the recipient source changes."""
+    for key in ('source', 'source_count', 'df'):
+        st.session_state.pop(key, None)
 
 def parse_file(uploaded_file):
     """Parse the uploaded file (CSV or Excel) into a pandas DataFrame."""
@@ -172,6 +202,8 @@ def main():
             if st.button("Logout"):
                 if os.path.exists(TOKEN_FILE):
                     os.remove(TOKEN_FILE)
+                # Forget the cached services so the next login starts fresh
+                cached_gmail_service.clear()
                 st.session_state.authenticated = False
                 st.session_state.user_email = ""
                 st.rerun()
@@ -198,13 +230,48 @@ def main():
         with tabs[0]:
             st.header("Step 1: Upload Your Data")
             
-            uploaded_file = st.file_uploader("Upload CSV or Excel file", type=['csv', 'xlsx', 'xls'])
+            data_source = st.radio("Recipient Source", ["Upload file", "SQLite database"], horizontal=True,
+                                   on_change=clear_recipients)
+            
+            if data_source == "SQLite database":
+                # Recipients are streamed from the database at send time; only a preview is kept
+                db_path = st.text_input("Database file", "recipients.db")
+                query = st.text_area("Query", "SELECT * FROM recipients", height=100)
+                key_column = st.text_input("Unique key column (used to page through results)", "id")
+                
+                if st.button("Load Recipients"):
+                    try:
+                        source = SqlRecipientSource(functools.partial(connect_sqlite_readonly, db_path),
+                                                    query, key=key_column)
+                        # Only keep the source once it has been read successfully
+                        count, preview = source.count(), pd.DataFrame(list(source.rows(limit=5)))
+                        st.session_state.source = source
+                        st.session_state.source_count = count
+                        st.session_state.df = preview
+                    except Exception as e:
+                        st.error(f"Database error: {str(e)}")
+                
+                if 'source' in st.session_state:
+                    df = st.session_state.df
+                    st.success(f"Query returns {st.session_state.source_count} records.")
+                    
+                    st.subheader("Data Preview")
+                    st.dataframe(df)
+                    
+                    st.subheader("Available Fields for Personalization")
+                    st.info("You can use these fields in your email template with {{field_name}} syntax")
+                    st.write(", ".join([f"{{{{**{col}**}}}}" for col in df.columns]))
+            
+            uploaded_file = None
+            if data_source == "Upload file":
+                uploaded_file = st.file_uploader("Upload CSV or Excel file", type=['csv', 'xlsx', 'xls'])
             
             if uploaded_file is not None:
                 df = parse_file(uploaded_file)
                 
                 if df is not None:
                     st.session_state.df = df
+                    st.session_state.pop('source', None)
                     st.success(f"Successfully loaded file with {len(df)} records.")
                     
                     # Preview the data
@@ -318,9 +385,22 @@ def main():
                 st.subheader("Attachments")
                 uploaded_files = st.file_uploader("Add attachments", type=['pdf', 'docx', 'xlsx', 'jpg', 'png', 'txt'], accept_multiple_files=True)
                 
+                # Spool uploads to the shared on-disk store and keep only handles in the session
+                stored_files = []
                 if uploaded_files:
-                    st.info(f"Added {len(uploaded_files)} attachment(s)")
+                    store = AttachmentStore()
+                    if 'stored_attachments' not in st.session_state:
+                        st.session_state.stored_attachments = {}
                     for file in uploaded_files:
+                        upload_key = (getattr(file, 'file_id', None), file.name, file.size)
+                        handle = st.session_state.stored_attachments.get(upload_key)
+                        # Keep the file from being evicted, or store it again if it already was
+                        if handle is None or not handle.touch():
+                            st.session_state.stored_attachments[upload_key] = store.put(file)
+                        stored_files.append(st.session_state.stored_attachments[upload_key])
+                    
+                    st.info(f"Added {len(stored_files)} attachment(s)")
+                    for file in stored_files:
                         st.write(f"- {file.name} ({file.size} bytes)")
                 
                 if email_type == "Personalized (Using template tags)" and st.session_state.df is not None:
@@ -346,7 +426,7 @@ def main():
                     "content": email_content,
                     "type": email_type,
                     "is_html": is_html,
-                    "attachments": uploaded_files if uploaded_files else None
+                    "attachments": stored_files if stored_files else None
                 }
         
         # Tab 3: Send & Results
@@ -358,8 +438,12 @@ def main():
             else:
                 col1, col2, col3 = st.columns([2, 1, 1])
                 
+                # A database source is only counted, never loaded whole
+                source = st.session_state.get('source')
+                total = st.session_state.source_count if source else len(st.session_state.df)
+                
                 with col1:
-                    st.metric("Recipients", len(st.session_state.df))
+                    st.metric("Recipients", total)
                 
                 with col2:
                     delay = st.number_input("Delay between emails (seconds)", min_value=0, value=1)
@@ -367,6 +451,56 @@ def main():
                 with col3:
                     test_mode = st.checkbox("Test Mode (send to yourself)", value=True)
                 
+                # Hand sending off to the shared daemon when one is running
+                daemon_running = daemon_available()
+                use_daemon = st.checkbox(
+                    "Send through shared send daemon",
+                    value=daemon_running,
+                    disabled=not daemon_running,
+                    help="Start it with `python send_daemon.py` so all sessions share one send pipeline."
+                )
+                
+                # How messages leave the app
+                delivery = st.radio("Delivery", ["Gmail API", "SMTP", "Gmail drafts (timed release)"],
+                                    horizontal=True, disabled=use_daemon,
+                                    help="Gmail drafts renders and uploads every email now, so they can all be released together later.")
+                if delivery == "SMTP":
+                    col1, col2, col3 = st.columns([2, 1, 1])
+                    
+                    with col1:
+                        smtp_host = st.text_input("SMTP Server", "smtp.gmail.com")
+                        smtp_username = st.text_input("SMTP Username", st.session_state.user_email)
+                        smtp_password = st.text_input("SMTP Password (app password for Gmail)", type="password")
+                    
+                    with col2:
+                        smtp_port = st.number_input("SMTP Port", min_value=1, max_value=65535, value=587)
+                        smtp_pool_size = st.number_input("Open connections", min_value=1, max_value=20, value=4)
+                    
+                    with col3:
+                        smtp_starttls = st.checkbox("Use STARTTLS", value=True)
+                
+                # Spread consecutive sends across recipient domains
+                col1, col2 = st.columns(2)
+                
+                with col1:
+                    interleave_domains = st.checkbox("Interleave recipients by domain", value=True,
+                                                     help="Avoids long runs of emails to one domain, which receiving servers throttle.")
+                
+                with col2:
+                    domain_interval = st.number_input("Min seconds between emails to the same domain", min_value=0.0, value=0.0,
+                                                      disabled=not interleave_domains)
+                
+                # Render to disk instead of sending, for QA of large campaigns
+                col1, col2 = st.columns(2)
+                
+                with col1:
+                    dry_run_format = st.selectbox("Dry Run (render to disk, nothing is sent)", ["Off"] + DRY_RUN_FORMATS)
+                
+                with col2:
+                    default_path = {"mbox": "dry_run/campaign.mbox", "eml": "dry_run/campaign", "zip": "dry_run/campaign.zip"}
+                    dry_run_path = st.text_input("Dry run output path", default_path.get(dry_run_format, ""),
+                                                 disabled=dry_run_format == "Off")
+                
                 if st.button("Send Emails"):
                     config = st.session_state.email_config
                     df = st.session_state.df
@@ -379,14 +513,67 @@ def main():
                     # Results tracking
                     results = []
                     
+                    # Job streaming messages to the send daemon
+                    daemon_job = None
+                    transport = writer = None
+                    
                     try:
-                        # Get Gmail service
-                        service = get_gmail_service()
+                        if dry_run_format != "Off":
+                            # Nothing leaves the machine in a dry run
+                            writer = DryRunWriter(dry_run_path, dry_run_format)
+                            service = tracker = transport = None
+                            progress_step = max(1, total // 100)
+                        elif delivery == "SMTP" and not use_daemon:
+                            writer = service = tracker = None
+                            transport = SmtpTransport(
+                                smtp_host,
+                                smtp_port,
+                                username=smtp_username or None,
+                                password=smtp_password,
+                                starttls=smtp_starttls,
+                                pool_size=smtp_pool_size
+                            )
+                        elif delivery == "Gmail drafts (timed release)" and not use_daemon:
+                            # Stage now, release later; tracking starts at release
+                            writer = tracker = None
+                            service = get_gmail_service(scopes=DRAFT_SCOPES)
+                            transport = DraftStager(service)
+                        else:
+                            writer = None
+                            
+                            if use_daemon:
+                                # The daemon owns the credentials and reports the mailbox history
+                                service = transport = None
+                                daemon_job = DaemonJob(delay=delay)
+                                tracker = BounceTracker(daemon_job.history_id) if daemon_job.history_id else None
+                            else:
+                                service = get_gmail_service()
+                                transport = GmailApiTransport(service)
+                                
+                                # Remember where the mailbox history stood before sending
+                                tracker = BounceTracker.start(service)
+                        
+                        # Encode attachments once for this campaign; they are dropped when it ends
+                        attachment_parts = [a.mime_part() for a in config["attachments"] or []]
+                        
+                        # Move pasted images out of the template once for the whole campaign
+                        if config["is_html"]:
+                            content, inline_images = extract_inline_images(config["content"])
+                        else:
+                            content, inline_images = config["content"], None
                         
                         # Send emails
-                        for i, (_, row) in enumerate(df.iterrows()):
-                            row_dict = row.to_dict()
-                            
+                        if source:
+                            # Stream only the columns the template needs
+                            rows = source.rows(template_fields(config["subject"], content))
+                        else:
+                            rows = (row.to_dict() for _, row in df.iterrows())
+                        if interleave_domains:
+                            # Dry runs and staged drafts deliver nothing, so they need no per-domain pacing
+                            delivers = writer is None and not isinstance(transport, DraftStager)
+                            rows = DomainScheduler(rows, domain_interval=domain_interval if delivers else 0)
+                        
+                        for i, row_dict in enumerate(rows):
                             # Get recipient email
                             recipient = row_dict.get('email', '')
                             if not recipient or not isinstance(recipient, str) or '@' not in recipient:
@@ -399,7 +586,7 @@ def main():
                                 continue
                             
                             # In test mode, send to the user's email instead
-                            if test_mode:
+                            if test_mode and writer is None:
                                 actual_recipient = st.session_state.user_email
                                 status_placeholder.info(f"TEST MODE: Sending to {actual_recipient} instead of {recipient}")
                             else:
@@ -408,23 +595,46 @@ def main():
                             # Personalize content if needed
                             if config["type"] == "Personalized (Using template tags)":
                                 email_subject = replace_placeholders(config["subject"], row_dict)
-                                email_body = replace_placeholders(config["content"], row_dict)
+                                email_body = replace_placeholders(content, row_dict)
                             else:
                                 email_subject = config["subject"]
-                                email_body = config["content"]
+                                email_body = content
                             
-                            # Create and send message
-                            message = create_message(
+                            message = build_mime_message(
                                 config["sender"],
                                 actual_recipient,
                                 email_subject,
                                 email_body,
                                 is_html=config["is_html"],
-                                attachments=config["attachments"]
+                                attachments=attachment_parts,
+                                inline_images=inline_images
                             )
                             
-                            status_placeholder.info(f"Sending email to {actual_recipient if test_mode else recipient} ({i+1}/{len(df)})...")
-                            success, message_id = send_message(service, 'me', message)
+                            # Render to disk in a dry run
+                            if writer is not None:
+                                writer.write(message, find_unresolved(email_subject, email_body))
+                                results.append({
+                                    "recipient": recipient,
+                                    "status": "Rendered",
+                                    "message_id": None,
+                                    "error": None,
+                                    "timestamp": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                                })
+                                if (i + 1) % progress_step == 0:
+                                    progress_bar.progress(min(1.0, (i + 1) / total))
+                                continue
+                            
+                            # Hand the message to the daemon and record whatever it has sent so far
+                            if daemon_job is not None:
+                                status_placeholder.info(f"Sending through the send daemon ({i+1}/{total} rendered)...")
+                                for event in daemon_job.add(recipient, encode_message(message)):
+                                    results.append(daemon_result(event))
+                                    progress_bar.progress(min(1.0, len(results) / total))
+                                continue
+                            
+                            # Send message
+                            status_placeholder.info(f"Sending email to {actual_recipient if test_mode else recipient} ({i+1}/{total})...")
+                            success, message_id = transport.send(message)
                             
                             # Record result
                             results.append({
@@ -436,14 +646,43 @@ def main():
                             })
                             
                             # Update progress
-                            progress_bar.progress((i + 1) / len(df))
+                            progress_bar.progress(min(1.0, (i + 1) / total))
                             
                             # Add delay between emails
-                            if i < len(df) - 1 and delay > 0:
+                            if i < total - 1 and delay > 0 and not isinstance(transport, DraftStager):
                                 time.sleep(delay)
                         
+                        # Wait for the daemon to send the rest
+                        if daemon_job is not None:
+                            for event in daemon_job.finish():
+                                results.append(daemon_result(event))
+                                progress_bar.progress(min(1.0, len(results) / total))
+                        
+                        # Record staged drafts for the release step
+                        if isinstance(transport, DraftStager):
+                            st.session_state.staged_path = transport.save()
+                        
+                        # Keep the results so bounces and replies can be checked later
+                        if tracker is not None:
+                            st.session_state.results = results
+                            st.session_state.tracker = tracker
+                            st.session_state.tracked_by_daemon = daemon_job is not None
+                        
+                        # Summarize what the dry run wrote
+                        if writer is not None:
+                            progress_bar.progress(1.0)
+                            report = writer.close()
+                            st.subheader("Dry Run Report")
+                            st.write(f"Rendered {report['messages']} emails ({report['total_bytes']} bytes) "
+                                     f"to {report['path']} in {report['elapsed_seconds']}s")
+                            st.write(f"Message size: min {report['size_min']}, median {report['size_median']}, "
+                                     f"95th percentile {report['size_p95']}, max {report['size_max']} bytes")
+                            if report['unresolved_placeholders']:
+                                st.warning(f"{report['rows_with_unresolved']} email(s) still contain placeholders: "
+                                           + ", ".join(f"{{{{{name}}}}} ({count})" for name, count in report['unresolved_placeholders'].items()))
+                        
                         # Show results
-                        success_count = sum(1 for r in results if r["status"] == "Success")
+                        success_count = sum(1 for r in results if r["status"] in ("Success", "Rendered"))
                         fail_count = len(results) - success_count
                         
                         status_class = "success" if fail_count == 0 else "error" if success_count == 0 else "info"
@@ -461,8 +700,119 @@ def main():
                         href = f'<a href="data:file/csv;base64,{b64}" download="email_results.csv">Download Results as CSV</a>'
                         st.markdown(href, unsafe_allow_html=True)
                         
+                        # Connection reuse so far
+                        stats = transport_stats(service)
+                        if stats:
+                            st.caption(f"HTTP requests: {stats['requests']}, connections opened: "
+                                       f"{stats['connections_opened']}, reuse: {stats['reuse_ratio']:.0%}")
+                        elif isinstance(transport, SmtpTransport):
+                            stats = transport.stats()
+                            st.caption(f"SMTP messages: {stats['messages']}, connections opened: {stats['connections_opened']}")
+                        
                     except Exception as e:
                         status_placeholder.error(f"Error: {str(e)}")
+                    finally:
+                        # Close pooled SMTP sessions and dry run output even if the campaign stopped early
+                        if transport is not None:
+                            transport.close()
+                        if writer is not None:
+                            writer.close()
+                
+            # Release drafts staged by this or an earlier session
+            staged_files = list_staged()
+            if staged_files:
+                st.subheader("Timed Release")
+                current = st.session_state.get('staged_path')
+                staged_path = st.selectbox("Staged drafts", staged_files,
+                                           index=staged_files.index(current) if current in staged_files else 0)
+                staged = load_staged(staged_path)
+                st.write(f"{len(staged)} drafts staged in {staged_path}")
+                
+                releases = scheduled_releases()
+                release = releases.get(staged_path)
+                
+                if release is None or release.state in ('failed', 'cancelled'):
+                    col1, col2, col3 = st.columns(3)
+                    
+                    with col1:
+                        release_date = st.date_input("Release date", datetime.date.today())
+                    
+                    with col2:
+                        release_time = st.time_input("Release time", datetime.time(9, 0))
+                    
+                    with col3:
+                        concurrency = st.number_input("Parallel sends", min_value=1, max_value=MAX_POOL_SIZE,
+                                                      value=DEFAULT_RELEASE_CONCURRENCY)
+                    
+                    if st.button("Schedule Release"):
+                        try:
+                            service = get_gmail_service(scopes=DRAFT_SCOPES)
+                            release_at = datetime.datetime.combine(release_date, release_time)
+                            # Waits in the background, so this session stays usable until the release
+                            release = ScheduledRelease(service, staged, release_at.timestamp(), concurrency)
+                            release.start()
+                            releases[staged_path] = release
+                        except Exception as e:
+                            st.error(f"Release error: {str(e)}")
+                
+                if release is not None:
+                    release_at = datetime.datetime.fromtimestamp(release.release_at)
+                    if release.state in ('scheduled', 'warming up', 'sending'):
+                        st.info(f"Release {release.state} for {release_at:%Y-%m-%d %H:%M:%S}.")
+                        col1, col2 = st.columns(2)
+                        with col1:
+                            st.button("Refresh Status")
+                        with col2:
+                            if release.state == 'scheduled' and st.button("Cancel Release"):
+                                release.cancel()
+                                release.join()
+                                st.rerun()
+                    elif release.state == 'failed':
+                        st.error(f"Release error: {release.error}")
+                    elif release.state == 'cancelled':
+                        st.warning("The release was cancelled.")
+                    else:
+                        outcomes = release.outcomes
+                        # Take over the results once so bounces and replies can be tracked
+                        if st.session_state.get('released_path') != staged_path:
+                            st.session_state.results = [{
+                                "recipient": draft["recipient"],
+                                "status": "Success" if outcome["success"] else "Failed",
+                                "message_id": outcome["message_id"],
+                                "error": outcome["error"],
+                                "timestamp": release_at.strftime("%Y-%m-%d %H:%M:%S"),
+                                "sent_after_seconds": round(outcome["completed"], 3)
+                            } for draft, outcome in zip(release.staged, outcomes)]
+                            st.session_state.tracker = BounceTracker(release.history_id)
+                            st.session_state.tracked_by_daemon = False
+                            st.session_state.released_path = staged_path
+                        
+                        report = release_report(outcomes)
+                        st.success(f"Released {report['sent']} of {report['drafts']} drafts, "
+                                   f"last one {report['last_sent']}s after release.")
+                        st.write(f"Sent within: 50% {report['p50_sent']}s, 90% {report['p90_sent']}s, "
+                                 f"99% {report['p99_sent']}s; mean call latency {report['mean_call_latency']}s")
+            
+            # Bounce and reply tracking for the last campaign
+            if 'tracker' in st.session_state:
+                st.subheader("Bounces & Replies")
+                if st.button("Check for Bounces and Replies"):
+                    try:
+                        if st.session_state.get('tracked_by_daemon'):
+                            # Leave the token to the daemon that sent the campaign
+                            st.session_state.tracker, changed = daemon_poll(
+                                st.session_state.tracker, st.session_state.results)
+                        else:
+                            changed = st.session_state.tracker.poll(get_gmail_service(), st.session_state.results)
+                        st.info(f"Updated {changed} result(s) from new mailbox activity.")
+                    except Exception as e:
+                        st.error(f"Tracking error: {str(e)}")
+                
+                tracked_df = pd.DataFrame(st.session_state.results)
+                if 'delivery' in tracked_df.columns:
+                    st.write(f"Bounced: {(tracked_df['delivery'] == 'Bounced').sum()}, "
+                             f"Replied: {(tracked_df['delivery'] == 'Replied').sum()}")
+                st.dataframe(tracked_df)
 
     # Footer
     st.markdown("---")
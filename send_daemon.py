@@ -0,0 +1,388 @@
+"""Shared local send daemon for the Email Sender App.
+
+Start it once with ``python send_daemon.py``. Every Streamlit session then
+streams its rendered messages to the daemon in small chunks and gets progress
+back, while the daemon alone owns the Gmail credentials, the token file and
+the overall send rate.
+
+The daemon listens on a Unix socket (a named pipe on Windows) that only its
+own user can open, and clients must also present a random key that the
+daemon writes to a file readable only by that user.
+"""
+import os
+import sys
+import time
+import queue
+import threading
+import collections
+from multiprocessing.connection import Listener, Client
+from google.auth.transport.requests import Request
+from http_transport import build_gmail_service, transport_stats
+from bounce_tracker import get_history_id
+from gmail_auth import load_credentials, save_credentials
+
+# Where the daemon listens
+if sys.platform == 'win32':
+    DAEMON_FAMILY = 'AF_PIPE'
+    DAEMON_ADDRESS = os.environ.get('SEND_DAEMON_SOCKET', r'\\.\pipe\autoemail-send-daemon')
+else:
+    DAEMON_FAMILY = 'AF_UNIX'
+    DAEMON_ADDRESS = os.environ.get('SEND_DAEMON_SOCKET', 'send_daemon.sock')
+
+# File holding the random key sessions must present, regenerated at every start
+AUTHKEY_FILE = os.environ.get('SEND_DAEMON_KEY_FILE', 'send_daemon.key')
+
+# Upper bound on sends per second across all sessions
+MAX_SENDS_PER_SECOND = float(os.environ.get('SEND_DAEMON_RATE', 2))
+
+# Messages a session sends to the daemon at a time
+DEFAULT_CHUNK_SIZE = 20
+
+# Messages a session may have at the daemon before it waits for progress
+DEFAULT_MAX_OUTSTANDING = 100
+
+
+def load_gmail_service():
+    """Build a Gmail service from the stored token, refreshing it if needed.
+
+    The daemon never runs the interactive OAuth flow; an operator has to log
+    in through the app once so that ``token.json`` exists.
+    """
+    creds = load_credentials()
+    if creds is None:
+        raise RuntimeError("No token.json found. Log in through the app first.")
+
+    if not creds.valid:
+        if creds.expired and creds.refresh_token:
+            creds.refresh(Request())
+            save_credentials(creds)
+        else:
+            raise RuntimeError("Stored credentials are invalid. Log in through the app again.")
+
+    return build_gmail_service(creds)
+
+
+def create_authkey(key_file=AUTHKEY_FILE):
+    """Write a new random key to ``key_file``, readable only by this user."""
+    key = os.urandom(32)
+    fd = os.open(key_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        # O_CREAT's mode does not apply to a file that already existed
+        os.chmod(key_file, 0o600)
+        f.write(key)
+    return key
+
+
+def read_authkey(key_file=AUTHKEY_FILE):
+    """Return the daemon's key, or None if it is not running for this user."""
+    try:
+        with open(key_file, 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+class SendJob:
+    """Messages streamed in by one session, sent as they arrive."""
+
+    def __init__(self, delay=0):
+        self.pending = collections.deque()
+        self.delay = delay
+        self.next_send = 0.0
+        self.events = queue.Queue()
+        self.closed = False
+        self.cancelled = False
+
+
+class SendDaemon:
+    """Accepts jobs from sessions and sends them through one Gmail service.
+
+    Active jobs are served round-robin so that one large campaign does not
+    starve the others, and a single global rate limit applies to all of them.
+    """
+
+    def __init__(self, address=DAEMON_ADDRESS, family=DAEMON_FAMILY, key_file=AUTHKEY_FILE,
+                 max_rate=MAX_SENDS_PER_SECOND, service_factory=load_gmail_service):
+        self.address = address
+        self.family = family
+        self.key_file = key_file
+        self.min_interval = 1.0 / max_rate if max_rate > 0 else 0.0
+        self.service_factory = service_factory
+        self.service = None
+        self.service_lock = threading.Lock()
+        self.jobs = collections.deque()
+        self.lock = threading.Condition()
+        self.last_send = 0.0
+
+    def _listen(self):
+        """Open the listener so that only the current user can connect."""
+        authkey = create_authkey(self.key_file)
+        if self.family != 'AF_UNIX':
+            return Listener(self.address, family=self.family, authkey=authkey)
+
+        if os.path.exists(self.address):
+            # Left behind by a daemon that did not shut down cleanly
+            os.remove(self.address)
+        old_umask = os.umask(0o177)
+        try:
+            return Listener(self.address, family=self.family, authkey=authkey)
+        finally:
+            os.umask(old_umask)
+
+    def serve_forever(self):
+        """Listen for sessions until interrupted."""
+        threading.Thread(target=self._worker, daemon=True).start()
+        with self._listen() as listener:
+            print(f"Send daemon listening on {self.address}")
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    # A client that fails authentication should not stop the daemon
+                    print(f"Rejected connection: {str(e)}")
+                    continue
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        """Serve one session connection."""
+        job = None
+        try:
+            request = conn.recv()
+            if request.get('action') == 'ping':
+                with self.lock:
+                    conn.send({
+                        'type': 'pong',
+                        'active_jobs': len(self.jobs),
+                        'transport': transport_stats(self.service),
+                    })
+                conn.close()
+                return
+
+            if request.get('action') == 'poll':
+                # Check bounces with the daemon's credentials so sessions never touch the token
+                tracker, results = request['tracker'], request['results']
+                changed = tracker.poll(self._service(), results)
+                conn.send({'type': 'polled', 'tracker': tracker, 'results': results, 'changed': changed})
+                conn.close()
+                return
+
+            if request.get('action') != 'submit':
+                conn.send({'type': 'error', 'error': f"Unknown action: {request.get('action')}"})
+                conn.close()
+                return
+
+            # Tell the session where the mailbox history stands before its first send
+            try:
+                history_id = get_history_id(self._service())
+            except Exception:
+                history_id = None
+            conn.send({'type': 'accepted', 'history_id': history_id})
+
+            job = SendJob(request.get('delay', 0))
+            with self.lock:
+                self.jobs.append(job)
+            threading.Thread(target=self._stream_events, args=(conn, job), daemon=True).start()
+
+            # Take chunks of messages until the session says it has no more
+            while True:
+                request = conn.recv()
+                with self.lock:
+                    if request.get('action') == 'append':
+                        job.pending.extend(request['messages'])
+                    else:
+                        job.closed = True
+                    self.lock.notify()
+                if job.closed:
+                    break
+        except (EOFError, OSError):
+            # The session went away; drop whatever it had left to send
+            if job is not None:
+                job.cancelled = True
+                with self.lock:
+                    self.lock.notify()
+            else:
+                conn.close()
+        except Exception as e:
+            if job is not None:
+                # A bad request mid-job: report it through the event stream and drop the job
+                job.events.put({'type': 'error', 'error': str(e)})
+                job.cancelled = True
+                with self.lock:
+                    self.lock.notify()
+                return
+            # A failed bounce check is reported back to the session
+            try:
+                conn.send({'type': 'error', 'error': str(e)})
+            finally:
+                conn.close()
+
+    @staticmethod
+    def _stream_events(conn, job):
+        """Send a job's progress back to its session until the job is done."""
+        try:
+            while True:
+                event = job.events.get()
+                conn.send(event)
+                if event['type'] == 'done':
+                    break
+        except (EOFError, OSError):
+            job.cancelled = True
+        finally:
+            conn.close()
+
+    def _next_job(self):
+        """Return the next job that may send now, or how long to wait."""
+        now = time.monotonic()
+        wait = None
+        for _ in range(len(self.jobs)):
+            job = self.jobs[0]
+            self.jobs.rotate(-1)
+            if job.cancelled or (job.closed and not job.pending):
+                self.jobs.remove(job)
+                job.events.put({'type': 'done'})
+                continue
+            if not job.pending:
+                # Waiting for the session's next chunk
+                continue
+            if job.next_send <= now:
+                return job, 0
+            remaining = job.next_send - now
+            wait = remaining if wait is None else min(wait, remaining)
+        return None, wait
+
+    def _worker(self):
+        """Send messages from the active jobs one at a time."""
+        while True:
+            with self.lock:
+                job, wait = self._next_job()
+                while job is None:
+                    self.lock.wait(timeout=wait)
+                    job, wait = self._next_job()
+                item = job.pending.popleft()
+
+            # Global rate limit across every session
+            gap = self.last_send + self.min_interval - time.monotonic()
+            if gap > 0:
+                time.sleep(gap)
+
+            success, result = self._send(item['message'])
+            self.last_send = time.monotonic()
+            job.next_send = self.last_send + job.delay
+            job.events.put({
+                'type': 'progress',
+                'index': item['index'],
+                'success': success,
+                'message_id': result if success else None,
+                'error': None if success else result,
+            })
+
+    def _service(self):
+        """Return the Gmail service, building it on first use."""
+        with self.service_lock:
+            if self.service is None:
+                self.service = self.service_factory()
+            return self.service
+
+    def _send(self, message):
+        """Send one message through the daemon's Gmail service."""
+        try:
+            sent = self._service().users().messages().send(userId='me', body=message).execute()
+            return True, sent['id']
+        except Exception as e:
+            return False, str(e)
+
+
+def daemon_available(address=DAEMON_ADDRESS, family=DAEMON_FAMILY, key_file=AUTHKEY_FILE):
+    """Check whether a send daemon is running."""
+    authkey = read_authkey(key_file)
+    if authkey is None:
+        return False
+    try:
+        with Client(address, family=family, authkey=authkey) as conn:
+            conn.send({'action': 'ping'})
+            return conn.recv().get('type') == 'pong'
+    except Exception:
+        return False
+
+
+def daemon_poll(tracker, results, address=DAEMON_ADDRESS, family=DAEMON_FAMILY, key_file=AUTHKEY_FILE):
+    """Run ``tracker.poll`` in the daemon and update ``results`` in place.
+
+    Returns the updated tracker and the number of rows that changed.
+    """
+    authkey = read_authkey(key_file)
+    if authkey is None:
+        raise RuntimeError("The send daemon is not running.")
+    with Client(address, family=family, authkey=authkey) as conn:
+        conn.send({'action': 'poll', 'tracker': tracker, 'results': results})
+        reply = conn.recv()
+    if reply['type'] == 'error':
+        raise RuntimeError(reply['error'])
+    results[:] = reply['results']
+    return reply['tracker'], reply['changed']
+
+
+class DaemonJob:
+    """Session side of a job: stream messages in, read progress back.
+
+    Messages are sent in chunks of ``chunk_size``, and ``add`` blocks once
+    ``max_outstanding`` messages are waiting at the daemon, so a session never
+    holds more than a chunk of rendered messages however large the campaign.
+    """
+
+    def __init__(self, delay=0, chunk_size=DEFAULT_CHUNK_SIZE, max_outstanding=DEFAULT_MAX_OUTSTANDING,
+                 address=DAEMON_ADDRESS, family=DAEMON_FAMILY, key_file=AUTHKEY_FILE):
+        authkey = read_authkey(key_file)
+        if authkey is None:
+            raise RuntimeError("The send daemon is not running.")
+        self.conn = Client(address, family=family, authkey=authkey)
+        self.conn.send({'action': 'submit', 'delay': delay})
+        # History ID from before the first send, or None if the daemon could not read it
+        self.history_id = self.conn.recv()['history_id']
+        self.chunk_size = chunk_size
+        self.max_outstanding = max_outstanding
+        self.chunk = []
+        # Recipients of messages the daemon has not reported on yet
+        self.outstanding = {}
+        self.next_index = 0
+
+    def add(self, recipient, message):
+        """Queue one encoded message; return the progress events received so far."""
+        self.outstanding[self.next_index] = recipient
+        self.chunk.append({'index': self.next_index, 'message': message})
+        self.next_index += 1
+        if len(self.chunk) >= self.chunk_size:
+            self._flush()
+        return list(self._events(until=self.max_outstanding))
+
+    def finish(self):
+        """Send the last chunk and yield the remaining progress events."""
+        self._flush()
+        self.conn.send({'action': 'close'})
+        try:
+            yield from self._events(until=0, done=True)
+        finally:
+            self.conn.close()
+
+    def _flush(self):
+        if self.chunk:
+            self.conn.send({'action': 'append', 'messages': self.chunk})
+            self.chunk = []
+
+    def _events(self, until, done=False):
+        """Yield events that are ready, waiting while more than ``until`` are outstanding."""
+        while True:
+            in_flight = len(self.outstanding) - len(self.chunk)
+            if not (done or in_flight > until) and not self.conn.poll():
+                return
+            event = self.conn.recv()
+            if event['type'] == 'error':
+                raise RuntimeError(event['error'])
+            if event['type'] == 'done':
+                return
+            event['recipient'] = self.outstanding.pop(event['index'])
+            yield event
+
+
+if __name__ == "__main__":
+    SendDaemon().serve_forever()
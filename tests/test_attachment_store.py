@@ -0,0 +1,59 @@
+import base64
+import io
+import os
+import time
+
+from attachment_store import AttachmentStore
+
+
+class Upload(io.BytesIO):
+    """Stands in for a Streamlit UploadedFile."""
+
+    def __init__(self, data, name='deck.pdf', type='application/pdf'):
+        super().__init__(data)
+        self.name = name
+        self.type = type
+
+
+def age(path, seconds):
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+def test_same_content_is_stored_once(tmp_path):
+    store = AttachmentStore(str(tmp_path))
+    first = store.put(Upload(b'slides'))
+    second = store.put(Upload(b'slides', name='copy.pdf'))
+
+    assert first.path == second.path
+    assert os.listdir(tmp_path) == [first.digest]
+    assert second.name == 'copy.pdf'
+
+
+def test_mime_part_round_trips_and_marks_file_used(tmp_path):
+    store = AttachmentStore(str(tmp_path), max_age=60)
+    handle = store.put(Upload(b'\x00binary' * 1000))
+    age(handle.path, 3600)
+
+    part = handle.mime_part()
+    assert base64.b64decode(part.get_payload()) == b'\x00binary' * 1000
+    assert part.get_filename() == 'deck.pdf'
+    store.evict()
+    assert os.path.exists(handle.path)
+
+
+def test_touched_files_survive_eviction(tmp_path):
+    store = AttachmentStore(str(tmp_path), max_age=60)
+    kept = store.put(Upload(b'kept'))
+    stale = store.put(Upload(b'stale'))
+    age(kept.path, 3600)
+    age(stale.path, 3600)
+
+    assert kept.touch()
+    store.evict()
+    assert os.path.exists(kept.path)
+    assert not os.path.exists(stale.path)
+    # An evicted handle reports it, so the session can store the file again
+    assert not stale.touch()
+    assert store.put(Upload(b'stale')).path == stale.path
+    assert os.path.exists(stale.path)
@@ -0,0 +1,49 @@
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+from bounce_tracker import BounceTracker
+
+
+def test_bounce_and_reply_across_pages(recorded_gmail, campaign_results):
+    service, results = recorded_gmail, campaign_results
+    tracker = BounceTracker.start(service)
+
+    assert tracker.poll(service, results) == 2
+    # Large pages keep a big campaign to a handful of calls
+    assert service.history_calls == [('1000', '', 500), ('1000', 'page-2', 500)]
+    assert results[0]['delivery'] == 'Bounced'
+    assert 'alice@example.com' in results[0]['delivery_detail']
+    assert results[1]['delivery'] == 'Replied'
+    assert 'delivery' not in results[2]
+    # Only messages in campaign threads have their headers fetched
+    assert service.fetched == ['b1', 'r1']
+    assert tracker.history_id == '1010'
+
+
+def test_later_poll_reads_only_new_history(recorded_gmail, campaign_results):
+    service, results = recorded_gmail, campaign_results
+    tracker = BounceTracker.start(service)
+    tracker.poll(service, results)
+
+    # A bounce after a reply is the stronger signal
+    assert tracker.poll(service, results) == 1
+    assert results[1]['delivery'] == 'Bounced'
+    assert tracker.poll(service, results) == 0
+    assert [call[0] for call in service.history_calls[2:]] == ['1010', '1012']
+
+
+def test_expired_history(recorded_gmail, campaign_results):
+    tracker = BounceTracker('1', 'me')
+
+    with pytest.raises(RuntimeError, match='expired'):
+        tracker.poll(recorded_gmail, campaign_results)
+    assert tracker.history_id == '1'
+
+
+def test_other_errors_are_not_reported_as_expired(recorded_gmail, campaign_results):
+    recorded_gmail.history_error = HttpError(httplib2.Response({'status': 500}), b'Backend error')
+    tracker = BounceTracker.start(recorded_gmail)
+
+    with pytest.raises(HttpError):
+        tracker.poll(recorded_gmail, campaign_results)
@@ -0,0 +1,112 @@
+import sqlite3
+
+import pytest
+
+from db_source import SqlRecipientSource, connect_sqlite_readonly, template_fields
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / 'recipients.db'
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE recipients (id INTEGER PRIMARY KEY, Email TEXT, Name TEXT, Plan TEXT)')
+    conn.executemany('INSERT INTO recipients VALUES (?, ?, ?, ?)',
+                     [(i, f'user{i}@example.com', f'User {i}', 'pro' if i % 2 else 'free')
+                      for i in range(1, 26)])
+    conn.commit()
+    conn.close()
+    return str(path)
+
+
+def source(db_path, query='SELECT * FROM recipients', **kwargs):
+    return SqlRecipientSource(lambda: connect_sqlite_readonly(db_path), query, **kwargs)
+
+
+def test_template_fields():
+    assert template_fields('Hi {{ Name }}', '{{plan}} and {{Name}}') == {'name', 'plan'}
+
+
+def test_rows_page_through_every_batch(db_path):
+    rows = list(source(db_path, batch_size=7).rows())
+
+    assert [r['id'] for r in rows] == list(range(1, 26))
+    assert rows[0] == {'id': 1, 'email': 'user1@example.com', 'name': 'User 1', 'plan': 'pro'}
+
+
+def test_rows_fetch_only_template_fields(db_path):
+    rows = list(source(db_path, batch_size=10).rows({'name', 'missing'}))
+
+    assert set(rows[0]) == {'id', 'email', 'name'}
+    assert len(rows) == 25
+
+
+def test_limit_and_count(db_path):
+    recipients = source(db_path, "SELECT * FROM recipients WHERE Plan LIKE 'p%'", batch_size=4)
+
+    assert recipients.count() == 13
+    assert [r['id'] for r in recipients.rows(limit=6)] == [1, 3, 5, 7, 9, 11]
+
+
+def test_query_must_return_email_and_key(db_path):
+    with pytest.raises(ValueError, match='Email'):
+        source(db_path, 'SELECT id, Name FROM recipients').columns()
+    with pytest.raises(ValueError, match='uid'):
+        source(db_path, key='uid').columns()
+
+
+def test_mistyped_path_is_not_created(tmp_path):
+    missing = tmp_path / 'typo.db'
+    with pytest.raises(sqlite3.OperationalError):
+        source(str(missing)).count()
+    assert not missing.exists()
+
+
+class MySqlCursor:
+    def __init__(self, log):
+        self.log = log
+        self.description = [('id',), ('Email',)]
+
+    def execute(self, sql, params):
+        self.log.append((sql, params))
+
+    def fetchall(self):
+        return []
+
+    def close(self):
+        pass
+
+
+class MySqlConnection:
+    """Records the SQL a format-paramstyle MySQL driver would receive."""
+
+    def __init__(self):
+        self.log = []
+
+    def cursor(self):
+        return MySqlCursor(self.log)
+
+    def close(self):
+        pass
+
+
+MySqlConnection.__module__ = 'pymysql.connections'
+
+
+def test_mysql_quoting_and_percent_escaping():
+    conn = MySqlConnection()
+    recipients = SqlRecipientSource(lambda: conn, "SELECT * FROM t WHERE Email LIKE '%@{corp}.com'",
+                                    paramstyle='format')
+    list(recipients.rows())
+
+    sql, params = conn.log[-1]
+    assert sql == ("SELECT `Email`, `id` FROM (SELECT * FROM t WHERE Email LIKE '%%@{corp}.com') AS src "
+                   "ORDER BY `id` LIMIT %s")
+    assert params == [1000]
+
+
+def test_identifier_quote_override():
+    conn = MySqlConnection()
+    recipients = SqlRecipientSource(lambda: conn, 'SELECT * FROM t', paramstyle='qmark', identifier_quote='"')
+    list(recipients.rows())
+
+    assert conn.log[-1] == ('SELECT "Email", "id" FROM (SELECT * FROM t) AS src ORDER BY "id" LIMIT ?', [1000])
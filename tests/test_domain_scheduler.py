@@ -0,0 +1,55 @@
+import pytest
+
+import domain_scheduler
+from domain_scheduler import DomainScheduler, recipient_domain
+
+
+def rows_for(*counts):
+    """Rows sorted by domain, as a list ordered by company would be."""
+    return [{'email': f'user{i}@{domain}.com', 'n': i}
+            for domain, count in zip('abc', counts) for i in range(count)]
+
+
+def test_recipient_domain():
+    assert recipient_domain('Jo@Example.COM ') == 'example.com'
+    assert recipient_domain('no-at-sign') == ''
+    assert recipient_domain(None) == ''
+
+
+def test_round_robin_across_domains():
+    order = [recipient_domain(r['email']) for r in DomainScheduler(rows_for(3, 2, 1))]
+    assert order == ['a.com', 'b.com', 'c.com', 'a.com', 'b.com', 'a.com']
+
+
+def test_spooled_rows_keep_their_order():
+    rows = rows_for(50, 5)
+    scheduled = list(DomainScheduler(rows, window=10, domain_buffer=4))
+
+    assert sorted(scheduled, key=lambda r: (r['email'].split('@')[1], r['n'])) == rows
+    a_rows = [r['n'] for r in scheduled if r['email'].endswith('@a.com')]
+    assert a_rows == list(range(50))
+
+
+def test_spooling_bounds_rows_in_memory():
+    scheduler = DomainScheduler(rows_for(500), window=20, domain_buffer=8)
+    first = next(iter(scheduler))
+
+    assert first['n'] == 0
+    assert scheduler.in_memory <= 8
+    assert len(scheduler.queues['a.com']) == 499
+
+
+def test_domain_interval_waits_between_rows_of_one_domain(monkeypatch):
+    clock = [0.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        clock[0] += seconds
+
+    monkeypatch.setattr(domain_scheduler.time, 'monotonic', lambda: clock[0])
+    monkeypatch.setattr(domain_scheduler.time, 'sleep', sleep)
+
+    order = [r['email'] for r in DomainScheduler(rows_for(2, 1), domain_interval=5)]
+    assert order == ['user0@a.com', 'user0@b.com', 'user1@a.com']
+    assert sleeps == [pytest.approx(5)]
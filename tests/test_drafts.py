@@ -0,0 +1,89 @@
+import json
+import threading
+import time
+
+import drafts
+from drafts import (DraftStager, ScheduledRelease, list_staged, load_staged, release_drafts, release_report,
+                    warm_up)
+from gmail_auth import SCOPES, DRAFT_SCOPES, load_credentials
+
+
+def test_warm_up_refreshes_once_and_uses_every_thread(gmail):
+    threads = set()
+    barrier = threading.Barrier(4)
+
+    def profile():
+        threads.add(threading.get_ident())
+        # Hold every call open until all have started, as slow connects would
+        barrier.wait(timeout=5)
+
+    gmail.on_profile = profile
+    assert warm_up(gmail, concurrency=4) == '1'
+    assert gmail._http.credentials.refreshed == 1
+    assert len(threads) == 4
+
+
+def test_release_keeps_order_and_reports_failures(gmail):
+    outcomes = release_drafts(gmail, ['a', 'bad', 'c'], concurrency=2)
+
+    assert [o['draft_id'] for o in outcomes] == ['a', 'bad', 'c']
+    assert outcomes[0]['message_id'] == 'msg-a'
+    assert outcomes[1] == dict(outcomes[1], success=False, error='not found')
+
+    report = release_report(outcomes)
+    assert (report['drafts'], report['sent'], report['failed']) == (3, 2, 1)
+    assert report['p50_sent'] <= report['last_sent']
+
+
+def test_stored_token_keeps_its_granted_scopes(tmp_path):
+    token = tmp_path / 'token.json'
+    token.write_text(json.dumps({
+        'client_id': 'id', 'client_secret': 'secret', 'refresh_token': 'refresh', 'scopes': SCOPES,
+    }))
+
+    creds = load_credentials(str(token))
+    assert creds.has_scopes(SCOPES)
+    # Drafts need a new login rather than a refresh that asks for scopes never granted
+    assert not creds.has_scopes(DRAFT_SCOPES)
+    assert load_credentials(str(tmp_path / 'missing.json')) is None
+
+
+def test_saved_drafts_can_be_loaded_back(tmp_path, gmail):
+    stager = DraftStager(gmail)
+    stager.staged = [{'recipient': 'a@example.com', 'draft_id': 'd1'}]
+    older = tmp_path / '20260101-090000.json'
+    older.write_text('[]')
+    path = stager.save(str(tmp_path))
+
+    assert list_staged(str(tmp_path)) == [path, str(older)]
+    assert load_staged(path) == stager.staged
+    assert list_staged(str(tmp_path / 'missing')) == []
+
+
+def test_scheduled_release_warms_up_then_sends(gmail, monkeypatch):
+    started = []
+    monkeypatch.setattr(drafts, 'release_drafts',
+                        lambda *args: started.append(time.time()) or release_drafts(*args))
+    staged = [{'recipient': 'a@example.com', 'draft_id': 'a'}, {'recipient': 'b@example.com', 'draft_id': 'b'}]
+    release = ScheduledRelease(gmail, staged, time.time() + 0.2, concurrency=2, warmup=0.1)
+    release.start()
+    assert release.state == 'scheduled'
+    release.join(timeout=5)
+
+    assert release.state == 'done'
+    assert release.history_id == '1'
+    assert gmail._http.credentials.refreshed == 1
+    assert [o['message_id'] for o in release.outcomes] == ['msg-a', 'msg-b']
+    # Sends start at the release time, not before it
+    assert started[0] >= release.release_at
+
+
+def test_scheduled_release_can_be_cancelled(gmail):
+    release = ScheduledRelease(gmail, [{'recipient': 'a@example.com', 'draft_id': 'a'}], time.time() + 60)
+    release.start()
+    release.cancel()
+    release.join(timeout=5)
+
+    assert release.state == 'cancelled'
+    assert release.outcomes is None
+    assert gmail._http.credentials.refreshed == 0
@@ -0,0 +1,103 @@
+import mailbox
+import os
+import zipfile
+from email.mime.text import MIMEText
+
+import pytest
+
+from dry_run import DryRunWriter, find_unresolved
+
+
+def message(n, body=None):
+    msg = MIMEText(body if body is not None else f'Hello {n}\n')
+    msg['to'] = f'user{n}@example.com'
+    msg['from'] = 'me@example.com'
+    msg['subject'] = f'Message {n}'
+    return msg
+
+
+def test_find_unresolved():
+    assert find_unresolved('Hi {{ Name }}', 'plan: {{plan}}, {{name}}') == ['name', 'plan', 'name']
+    assert find_unresolved('Hi Ann') == []
+
+
+def test_mbox_quotes_from_lines(tmp_path):
+    path = str(tmp_path / 'campaign.mbox')
+    writer = DryRunWriter(path, 'mbox')
+    writer.write(message(1, 'From here on\n>From quoted\nbody\n'))
+    writer.write(message(2))
+    writer.close()
+
+    raw = open(path, 'rb').read()
+    assert b'\n>From here on\n' in raw
+    assert b'\n>>From quoted\n' in raw
+    # mboxrd readers undo one level of quoting and see both messages
+    messages = list(mailbox.mbox(path))
+    assert [m['subject'] for m in messages] == ['Message 1', 'Message 2']
+
+
+@pytest.mark.parametrize('fmt', ['eml', 'zip'])
+def test_names_continue_across_flushes(tmp_path, fmt):
+    path = str(tmp_path / ('campaign.zip' if fmt == 'zip' else 'campaign'))
+    # A tiny buffer flushes after every message
+    writer = DryRunWriter(path, fmt, buffer_size=1)
+    for n in range(1, 4):
+        writer.write(message(n))
+    writer.close()
+
+    if fmt == 'zip':
+        with zipfile.ZipFile(path) as archive:
+            names = archive.namelist()
+            assert b'Message 3' in archive.read('0000003.eml')
+    else:
+        names = sorted(os.listdir(path))
+    assert names == ['0000001.eml', '0000002.eml', '0000003.eml']
+
+
+def test_eml_replaces_an_earlier_run(tmp_path):
+    path = str(tmp_path / 'campaign')
+    writer = DryRunWriter(path, 'eml')
+    for n in range(1, 4):
+        writer.write(message(n))
+    writer.close()
+
+    writer = DryRunWriter(path, 'eml')
+    writer.write(message(9))
+    writer.close()
+    assert os.listdir(path) == ['0000001.eml']
+
+
+def test_eml_refuses_a_directory_with_other_files(tmp_path):
+    (tmp_path / 'notes.txt').write_text('keep me')
+    with pytest.raises(ValueError, match='other files'):
+        DryRunWriter(str(tmp_path), 'eml')
+    assert os.listdir(tmp_path) == ['notes.txt']
+
+
+def test_second_close_keeps_the_zip_valid(tmp_path):
+    path = str(tmp_path / 'campaign.zip')
+    writer = DryRunWriter(path, 'zip')
+    writer.write(message(1))
+    writer.close()
+    # Cleanup closes again; that must not fail or rewrite anything
+    writer.close()
+
+    with zipfile.ZipFile(path) as archive:
+        assert archive.namelist() == ['0000001.eml']
+
+
+def test_report(tmp_path):
+    writer = DryRunWriter(str(tmp_path / 'campaign.mbox'), 'mbox')
+    for n in range(1, 21):
+        unresolved = ['company'] * (n % 2) + ['plan'] * (n % 5 == 0)
+        writer.write(message(n, 'x' * n * 10), unresolved)
+    sizes = sorted(len(message(n, 'x' * n * 10).as_bytes()) for n in range(1, 21))
+    report = writer.close()
+
+    assert report['messages'] == 20
+    assert report['total_bytes'] == sum(sizes)
+    assert report['size_min'] == sizes[0] and report['size_max'] == sizes[-1]
+    assert report['size_median'] == sizes[10]
+    assert report['size_p95'] == sizes[19]
+    assert report['rows_with_unresolved'] == 12
+    assert report['unresolved_placeholders'] == {'company': 10, 'plan': 4}
@@ -0,0 +1,79 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from google.oauth2.credentials import Credentials
+
+from http_transport import PooledHttp, build_gmail_service, transport_stats
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    drops_left = 0
+    seen = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        if Handler.drops_left:
+            # Hang up without answering, as a server closing an idle keep-alive does
+            Handler.drops_left -= 1
+            self.close_connection = True
+            return
+        Handler.seen.append((self.path, self.headers['Authorization'], body))
+        payload = b'{"id": "abc"}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    Handler.drops_left = 0
+    Handler.seen = []
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{httpd.server_port}'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def pooled_http():
+    return PooledHttp(Credentials(token='token'), pool_size=2)
+
+
+def test_request_looks_like_httplib2(server):
+    http = pooled_http()
+    response, content = http.request(server + '/send', 'POST', body=b'{}',
+                                     headers={'Content-Type': 'application/json'})
+
+    assert response.status == 200
+    assert response['status'] == '200'
+    assert response['content-type'] == 'application/json'
+    assert content == b'{"id": "abc"}'
+    assert Handler.seen == [('/send', 'Bearer token', b'{}')]
+    http.close()
+
+
+def test_stats_show_connection_reuse(server):
+    http = pooled_http()
+    for _ in range(5):
+        http.request(server + '/send', 'POST', body=b'{}')
+
+    assert http.stats() == {'requests': 5, 'connections_opened': 1, 'reuse_ratio': 0.8}
+    assert transport_stats(build_gmail_service(None, http=http)) == http.stats()
+    http.close()
+
+
+def test_dropped_connection_is_retried(server):
+    http = pooled_http()
+    Handler.drops_left = 1
+    response, _ = http.request(server + '/send', 'POST', body=b'{}')
+
+    assert response.status == 200
+    assert len(Handler.seen) == 1
+    http.close()
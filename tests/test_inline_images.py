@@ -0,0 +1,51 @@
+import base64
+
+from inline_images import extract_inline_images
+from main import build_mime_message
+
+PIXEL = b'\x89PNG\r\n\x1a\n' + b'\x00' * 32
+OTHER = b'GIF89a' + b'\x01' * 16
+
+
+def data_uri(data, subtype='png'):
+    return f"data:image/{subtype};base64,{base64.b64encode(data).decode()}"
+
+
+def test_both_quote_styles_are_replaced():
+    html = f'<img src="{data_uri(PIXEL)}"><img src=\'{data_uri(OTHER, "gif")}\'>'
+    rewritten, parts = extract_inline_images(html)
+
+    assert 'data:' not in rewritten
+    assert rewritten.count('src="cid:') == 1 and rewritten.count("src='cid:") == 1
+    assert [p.get_content_type() for p in parts] == ['image/png', 'image/gif']
+    assert [p.get_payload(decode=True) for p in parts] == [PIXEL, OTHER]
+
+
+def test_identical_images_share_one_part():
+    # Editors may wrap long base64 lines
+    wrapped = data_uri(PIXEL).replace('AAAA', 'AAAA\n', 1)
+    html = f'<img src="{data_uri(PIXEL)}"><p>text</p><img src="{wrapped}">'
+    rewritten, parts = extract_inline_images(html)
+
+    assert len(parts) == 1
+    cid = parts[0]['Content-ID'].strip('<>')
+    assert rewritten.count(f'cid:{cid}') == 2
+    assert parts[0]['Content-Disposition'] == 'inline'
+
+
+def test_html_without_images_is_unchanged():
+    assert extract_inline_images('<p>Hello {{name}}</p>') == ('<p>Hello {{name}}</p>', ())
+
+
+def test_message_keeps_html_and_images_in_one_related_part():
+    html, parts = extract_inline_images(f'<p>Hi</p><img src="{data_uri(PIXEL)}">')
+    message = build_mime_message('me@example.com', 'you@example.com', 'Hello', html,
+                                 is_html=True, inline_images=parts)
+
+    assert message.get_content_type() == 'multipart/alternative'
+    related, = message.get_payload()
+    assert related.get_content_type() == 'multipart/related'
+    body, image = related.get_payload()
+    assert body.get_content_type() == 'text/html'
+    assert image['Content-ID'] == parts[0]['Content-ID']
+    assert f"cid:{image['Content-ID'].strip('<>')}" in body.get_payload(decode=True).decode()
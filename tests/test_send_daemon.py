@@ -0,0 +1,135 @@
+import os
+import stat
+import sys
+import threading
+import time
+from multiprocessing.connection import Client
+
+import pytest
+
+from bounce_tracker import BounceTracker
+from send_daemon import SendDaemon, DaemonJob, daemon_available, daemon_poll
+
+pytestmark = pytest.mark.skipif(sys.platform == 'win32', reason="uses a Unix socket")
+
+
+@pytest.fixture
+def start_daemon(tmp_path):
+    """Start a daemon around a fake service on a private socket; returns its address."""
+    def start(service):
+        paths = {
+            'address': str(tmp_path / 'daemon.sock'),
+            'family': 'AF_UNIX',
+            'key_file': str(tmp_path / 'daemon.key'),
+        }
+        server = SendDaemon(max_rate=0, service_factory=lambda: service, **paths)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        for _ in range(100):
+            if os.path.exists(paths['address']):
+                break
+            time.sleep(0.01)
+        return paths
+    return start
+
+
+@pytest.fixture
+def daemon(start_daemon, gmail):
+    return gmail, start_daemon(gmail)
+
+
+def test_socket_and_key_are_private(daemon):
+    _, paths = daemon
+    assert stat.S_IMODE(os.stat(paths['key_file']).st_mode) == 0o600
+    assert stat.S_IMODE(os.stat(paths['address']).st_mode) == 0o600
+    assert daemon_available(**paths)
+
+
+def test_wrong_key_is_rejected(daemon):
+    _, paths = daemon
+    with pytest.raises(Exception):
+        with Client(paths['address'], family='AF_UNIX', authkey=b'autoemail') as conn:
+            conn.send({'action': 'ping'})
+            conn.recv()
+
+
+def test_not_available_without_key_file(daemon, tmp_path):
+    _, paths = daemon
+    assert not daemon_available(paths['address'], 'AF_UNIX', str(tmp_path / 'missing.key'))
+
+
+def test_job_streams_in_chunks_with_bounded_backlog(daemon):
+    service, paths = daemon
+    job = DaemonJob(chunk_size=3, max_outstanding=5, **paths)
+
+    events = []
+    for i in range(20):
+        events += job.add(f'user{i}@example.com', {'raw': str(i), 'fail': i == 7})
+        # Never more than the backlog plus one unsent chunk waits on the daemon
+        assert len(job.outstanding) <= 5 + 3
+    events += list(job.finish())
+
+    assert sorted(e['index'] for e in events) == list(range(20))
+    by_index = {e['index']: e for e in events}
+    assert by_index[7]['success'] is False and by_index[7]['error'] == 'rejected'
+    assert by_index[3]['message_id'] == 'id-3'
+    assert by_index[3]['recipient'] == 'user3@example.com'
+    assert len(service.sent) == 19
+
+
+def test_concurrent_jobs_are_interleaved(daemon):
+    _, paths = daemon
+    order = []
+
+    def run(tag):
+        # The per-job delay gives the other campaign a turn between sends
+        job = DaemonJob(delay=0.02, chunk_size=1, max_outstanding=50, **paths)
+        for i in range(5):
+            job.add(f'{tag}{i}@example.com', {'raw': f'{tag}{i}'})
+        for event in job.finish():
+            order.append(event['message_id'])
+
+    threads = [threading.Thread(target=run, args=(tag,)) for tag in 'ab']
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(order) == 10
+    # Neither campaign ran entirely before the other started
+    first_b = min(i for i, m in enumerate(order) if m.startswith('id-b'))
+    first_a = min(i for i, m in enumerate(order) if m.startswith('id-a'))
+    assert max(first_a, first_b) < 5
+
+
+def test_job_gets_history_id_and_bounces_are_checked_by_daemon(start_daemon, recorded_gmail, campaign_results):
+    paths = start_daemon(recorded_gmail)
+
+    job = DaemonJob(**paths)
+    assert job.history_id == '1000'
+    assert list(job.finish()) == []
+
+    tracker = BounceTracker(job.history_id)
+    results = campaign_results
+    tracker, changed = daemon_poll(tracker, results, **paths)
+    assert changed == 2
+    assert results[0]['delivery'] == 'Bounced'
+    assert tracker.history_id == '1010'
+
+
+def test_poll_errors_are_reported(start_daemon, recorded_gmail, campaign_results):
+    paths = start_daemon(recorded_gmail)
+    with pytest.raises(RuntimeError, match='expired'):
+        daemon_poll(BounceTracker('1'), campaign_results, **paths)
+
+
+def test_bad_request_mid_job_drops_the_job(daemon):
+    _, paths = daemon
+    authkey = open(paths['key_file'], 'rb').read()
+    with Client(paths['address'], family='AF_UNIX', authkey=authkey) as conn:
+        conn.send({'action': 'submit', 'delay': 0})
+        conn.recv()
+        conn.send({'action': 'append', 'messages': None})
+
+        assert conn.recv()['type'] == 'error'
+        # The job is removed from the daemon rather than left running
+        assert conn.recv() == {'type': 'done'}
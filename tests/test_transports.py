@@ -0,0 +1,115 @@
+import socket
+from email.mime.text import MIMEText
+
+import pytest
+
+pytest.importorskip('aiosmtpd')
+from aiosmtpd.controller import Controller
+
+from transports import SmtpTransport, Transport
+
+
+class RecordingHandler:
+    """aiosmtpd handler that keeps every message and refuses 'nobody@' recipients."""
+
+    def __init__(self):
+        self.messages = []
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith('nobody@'):
+            return '550 No such user'
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return '250 OK'
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+    handler = RecordingHandler()
+    controller = Controller(handler, hostname='127.0.0.1', port=free_port())
+    controller.start()
+    yield handler, controller.port
+    controller.stop()
+
+
+def message(to, body="Hello\n.hidden line\nBye"):
+    msg = MIMEText(body)
+    msg['to'] = to
+    msg['from'] = 'Sender <sender@example.com>'
+    msg['subject'] = 'Test'
+    return msg
+
+
+@pytest.mark.parametrize('pipelining', [True, False])
+def test_messages_share_a_session(smtp_server, pipelining):
+    handler, port = smtp_server
+    transport = SmtpTransport('127.0.0.1', port, starttls=False, pool_size=1, pipelining=pipelining)
+    try:
+        outcomes = [transport.send(message(f'user{i}@example.org')) for i in range(5)]
+    finally:
+        transport.close()
+
+    assert all(success for success, _ in outcomes)
+    assert transport.stats() == {'messages': 5, 'connections_opened': 1}
+    assert [m.rcpt_tos for m in handler.messages] == [[f'user{i}@example.org'] for i in range(5)]
+    # Dot-stuffing is undone by the server, so the body arrives unchanged
+    assert b'\r\n.hidden line\r\n' in handler.messages[0].original_content
+
+
+def test_date_and_message_id_are_set(smtp_server):
+    handler, port = smtp_server
+    transport = SmtpTransport('127.0.0.1', port, starttls=False, pipelining=True)
+    msg = message('user@example.org')
+    try:
+        success, message_id = transport.send(msg)
+    finally:
+        transport.close()
+
+    assert success
+    assert message_id == msg['Message-ID']
+    assert message_id.endswith('@example.com>')
+    received = handler.messages[0].original_content
+    assert f'Message-ID: {message_id}'.encode() in received
+    assert b'\r\nDate: ' in received
+
+
+def test_existing_message_id_is_kept(smtp_server):
+    _, port = smtp_server
+    transport = SmtpTransport('127.0.0.1', port, starttls=False)
+    msg = message('user@example.org')
+    msg['Message-ID'] = '<fixed@example.com>'
+    try:
+        assert transport.send(msg) == (True, '<fixed@example.com>')
+    finally:
+        transport.close()
+
+
+def test_refused_recipient_keeps_session_usable(smtp_server):
+    handler, port = smtp_server
+    transport = SmtpTransport('127.0.0.1', port, starttls=False, pool_size=1, pipelining=True)
+    try:
+        refused = transport.send(message('nobody@example.org'))
+        sent = transport.send(message('user@example.org'))
+    finally:
+        transport.close()
+
+    assert refused[0] is False
+    assert sent[0] is True
+    assert [m.rcpt_tos for m in handler.messages] == [['user@example.org']]
+
+
+def test_incomplete_transport_fails_when_created():
+    class NoSend(Transport):
+        pass
+
+    with pytest.raises(TypeError):
+        NoSend()
@@ -0,0 +1,217 @@
+"""Transports the send loop delivers messages through.
+
+Every transport takes a built ``email.message.Message`` and returns
+``(success, message_id_or_error)``. ``GmailApiTransport`` is the Gmail REST
+path the app has always used;
+``SmtpTransport`` keeps a pool of authenticated SMTP sessions open across
+messages and pipelines the envelope commands when the server allows it. It
+returns the ``Message-ID`` it stamps on each message, since SMTP servers do
+not hand back an ID the way the Gmail API does.
+"""
+import abc
+import base64
+import queue
+import re
+import smtplib
+import threading
+from email.utils import formatdate, getaddresses, make_msgid
+
+# Sessions are recycled after this many messages to stay under server limits
+DEFAULT_MESSAGES_PER_CONNECTION = 100
+
+CRLF = b'\r\n'
+EOL_PATTERN = re.compile(rb'\r\n|\r(?!\n)|\n')
+LEADING_DOT_PATTERN = re.compile(rb'^\.', re.MULTILINE)
+
+
+class Transport(abc.ABC):
+    """Interface the send loop uses to deliver a message."""
+
+    name = 'transport'
+
+    @abc.abstractmethod
+    def send(self, message):
+        """Send an ``email.message.Message``; return ``(success, id_or_error)``."""
+
+    def close(self):
+        """Release any connections held by the transport."""
+
+
+class GmailApiTransport(Transport):
+    """Send through the Gmail REST API, one HTTP request per message."""
+
+    name = 'Gmail API'
+
+    def __init__(self, service, user_id='me'):
+        self.service = service
+        self.user_id = user_id
+
+    def send(self, message):
+        raw = base64.urlsafe_b64encode(message.as_bytes()).decode('utf-8')
+        try:
+            sent = self.service.users().messages().send(userId=self.user_id, body={'raw': raw}).execute()
+            return True, sent['id']
+        except Exception as e:
+            return False, str(e)
+
+
+class _SmtpSession:
+    """One open SMTP connection and how many messages it has carried."""
+
+    def __init__(self, conn, pipelining):
+        self.conn = conn
+        self.pipelining = pipelining
+        self.sent = 0
+
+
+class SmtpTransport(Transport):
+    """Send over a pool of persistent SMTP sessions.
+
+    ``pipelining`` is ``None`` to use RFC 2920 pipelining only when the server
+    advertises it, or ``True``/``False`` to force it on or off. The transport
+    is safe to share between threads; each thread borrows its own session.
+    """
+
+    name = 'SMTP'
+
+    def __init__(self, host, port=587, username=None, password=None, starttls=True,
+                 pool_size=4, timeout=30, pipelining=None,
+                 messages_per_connection=DEFAULT_MESSAGES_PER_CONNECTION):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self.pipelining = pipelining
+        self.messages_per_connection = messages_per_connection
+        self.idle = queue.LifoQueue()
+        self.slots = threading.BoundedSemaphore(pool_size)
+        self.lock = threading.Lock()
+        self.connections_opened = 0
+        self.messages_sent = 0
+
+    def _connect(self):
+        conn = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        conn.ehlo()
+        if self.starttls and conn.has_extn('starttls'):
+            conn.starttls()
+            conn.ehlo()
+        if self.username:
+            conn.login(self.username, self.password)
+        pipelining = conn.has_extn('pipelining') if self.pipelining is None else self.pipelining
+        with self.lock:
+            self.connections_opened += 1
+        return _SmtpSession(conn, pipelining)
+
+    def _acquire(self):
+        self.slots.acquire()
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            try:
+                return self._connect()
+            except Exception:
+                self.slots.release()
+                raise
+
+    def _release(self, session, healthy):
+        if healthy and session.sent < self.messages_per_connection:
+            self.idle.put(session)
+        else:
+            self._quit(session)
+        self.slots.release()
+
+    @staticmethod
+    def _quit(session):
+        try:
+            session.conn.quit()
+        except Exception:
+            session.conn.close()
+
+    def send(self, message):
+        sender = getaddresses(message.get_all('from', []))
+        recipients = [addr for _, addr in getaddresses(message.get_all('to', []) + message.get_all('cc', []))]
+        if not sender or not recipients:
+            return False, "Message has no sender or recipients"
+
+        # Gmail's API adds these itself; an SMTP relay may not
+        if message['Date'] is None:
+            message['Date'] = formatdate(localtime=True)
+        if message['Message-ID'] is None:
+            message['Message-ID'] = make_msgid(domain=sender[0][1].rpartition('@')[2] or None)
+        # SMTP needs CRLF line endings; smtplib only fixes them for str messages
+        data = EOL_PATTERN.sub(CRLF, message.as_bytes())
+
+        # A pooled session may have been dropped by the server; retry once on a fresh one
+        for attempt in range(2):
+            try:
+                session = self._acquire()
+            except Exception as e:
+                return False, str(e)
+            try:
+                if session.pipelining:
+                    self._send_pipelined(session.conn, sender[0][1], recipients, data)
+                else:
+                    session.conn.sendmail(sender[0][1], recipients, data)
+                session.sent += 1
+                self._release(session, healthy=True)
+                with self.lock:
+                    self.messages_sent += 1
+                return True, message['Message-ID']
+            except smtplib.SMTPServerDisconnected as e:
+                self._release(session, healthy=False)
+                if attempt:
+                    return False, str(e)
+            except Exception as e:
+                self._release(session, healthy=False)
+                return False, str(e)
+
+    @staticmethod
+    def _send_pipelined(conn, sender, recipients, data):
+        """Send the envelope and DATA in one round trip, then the CRLF ``data`` in a second."""
+        commands = [f'MAIL FROM:<{sender}>'] + [f'RCPT TO:<{rcpt}>' for rcpt in recipients] + ['DATA']
+        conn.send(''.join(command + '\r\n' for command in commands))
+
+        code, reply = conn.getreply()
+        if code != 250:
+            # Drain the remaining replies so the session stays in sync
+            for _ in commands[1:]:
+                conn.getreply()
+            conn.rset()
+            raise smtplib.SMTPSenderRefused(code, reply, sender)
+
+        accepted = 0
+        for _ in recipients:
+            code, _ = conn.getreply()
+            accepted += code in (250, 251)
+        code, reply = conn.getreply()
+        if code != 354:
+            conn.rset()
+            raise smtplib.SMTPRecipientsRefused(dict.fromkeys(recipients, (code, reply)))
+        if not accepted:
+            # Some servers answer DATA with 354 even when every RCPT failed
+            conn.send(b'.' + CRLF)
+            conn.getreply()
+            raise smtplib.SMTPRecipientsRefused(dict.fromkeys(recipients, (code, reply)))
+
+        body = LEADING_DOT_PATTERN.sub(b'..', data)
+        if not body.endswith(CRLF):
+            body += CRLF
+        conn.send(body + b'.' + CRLF)
+        code, reply = conn.getreply()
+        if code != 250:
+            raise smtplib.SMTPDataError(code, reply)
+        return reply.decode('utf-8', 'replace')
+
+    def stats(self):
+        """Return how many sessions were opened for how many messages."""
+        with self.lock:
+            return {'messages': self.messages_sent, 'connections_opened': self.connections_opened}
+
+    def close(self):
+        while True:
+            try:
+                self._quit(self.idle.get_nowait())
+            except queue.Empty:
+                return